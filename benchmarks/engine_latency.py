@@ -0,0 +1,149 @@
+"""
+Latency of the main event loop while polling a simulated fleet, with the miner I/O
+on the main loop and on the polling engine.
+
+    python -m benchmarks.engine_latency --miners 1000 --rounds 5 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import List
+
+from custom_components.whatsminer.api import WhatsminerApi, WhatsminerMachine
+from custom_components.whatsminer.engine import PollingEngine
+
+SUMMARY = {
+    "STATUS": "S",
+    "SUMMARY": [
+        {
+            "Elapsed": 1000,
+            "MHS av": 68000000.0,
+            "MHS 5s": 67000000.0,
+            "MHS 1m": 68000000.0,
+            "MHS 5m": 68000000.0,
+            "MHS 15m": 68000000.0,
+            "Accepted": 1000,
+            "Rejected": 2,
+            "Temperature": 70.0,
+            "freq_avg": 600,
+            "Fan Speed In": 4000,
+            "Fan Speed Out": 4100,
+            "Power": 3300,
+            "Power_RT": 3300,
+            "Pool Rejected%": 0.1,
+            "Pool Stale%": 0.0,
+            "Uptime": 10000,
+            "Security Mode": 0,
+            "Target Freq": 600,
+            "Target MHS": 68000000,
+            "Env Temp": 25.0,
+            "Power Mode": "Normal",
+            "Chip Temp Min": 60.0,
+            "Chip Temp Max": 80.0,
+            "Chip Temp Avg": 70.0,
+            "MAC": "C4:11:22:33:44:55",
+        }
+    ],
+}
+VERSION = {"STATUS": "S", "Msg": {"api_ver": "whatsminer v1.4.0", "fw_ver": "1"}}
+RESPONSES = {
+    "summary": json.dumps(SUMMARY).encode() + b"\n",
+    "get_version": json.dumps(VERSION).encode() + b"\n",
+}
+
+
+def start_fake_miner(port: int) -> asyncio.AbstractEventLoop:
+    # Served from its own thread, so that it does not load the measured loop
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        request = json.loads(await reader.read(4096))
+        writer.write(RESPONSES[request["cmd"]])
+        await writer.drain()
+        writer.close()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(
+            asyncio.start_server(handle, "127.0.0.1", port, backlog=4096)
+        )
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return loop
+
+
+async def measure_lag(stop: asyncio.Event, samples: List[float], interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def poll(api: WhatsminerApi):
+    await api.get_summary()
+    await api.get_version()
+
+
+async def run(arguments: argparse.Namespace, use_engine: bool):
+    apis = [
+        WhatsminerApi(WhatsminerMachine("127.0.0.1", arguments.port))
+        for _ in range(arguments.miners)
+    ]
+    engine = None
+    if use_engine:
+        engine = PollingEngine(asyncio.get_running_loop(), arguments.workers)
+        engine.start()
+    semaphore = asyncio.Semaphore(arguments.concurrency)
+
+    async def poll_one(index: int, api: WhatsminerApi):
+        async with semaphore:
+            if engine is None:
+                await poll(api)
+            else:
+                await engine.run(f"miner{index}", lambda: poll(api))
+
+    samples: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.ensure_future(measure_lag(stop, samples))
+    start = time.perf_counter()
+    for _ in range(arguments.rounds):
+        await asyncio.gather(*(poll_one(i, api) for i, api in enumerate(apis)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    if engine is not None:
+        engine.stop()
+
+    samples.sort()
+    print(
+        f"engine={'on ' if use_engine else 'off'} "
+        f"polls={arguments.miners * arguments.rounds} time={elapsed:.2f}s "
+        f"lag mean={statistics.mean(samples) * 1000:.2f}ms "
+        f"p99={samples[int(len(samples) * 0.99)] * 1000:.2f}ms "
+        f"max={samples[-1] * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--miners", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=14029)
+    arguments = parser.parse_args()
+
+    start_fake_miner(arguments.port)
+    asyncio.run(run(arguments, use_engine=False))
+    asyncio.run(run(arguments, use_engine=True))
+
+
+if __name__ == "__main__":
+    main()
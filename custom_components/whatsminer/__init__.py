@@ -3,32 +3,147 @@ Expose Whatsminer to HA
 """
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import logging
+from typing import TYPE_CHECKING
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from .const import (
+    DOMAIN,
+    COORDINATOR,
+    MINER,
+    EXPORTER,
+    FLEET,
+    ENGINE,
+    PROTECTION_LEVELS,
+    FIRST_REFRESH_TIMEOUT,
+    CONF_IO_THREADS,
+    SIGNAL_MINER_UPDATED,
+)
+from .engine import PollingEngine
+from .exporter import MetricsCache
+from .fleet import FleetAggregator
 
-from .api import WhatsminerMachine
-from .const import DOMAIN, COORDINATOR, MINER
-from .coordinator import WhatsminerCoordinator
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
 
-PLATFORMS = [Platform.SENSOR, Platform.SWITCH]
+# Home Assistant is only imported when the integration is actually set up, so that
+# the API client and the command line tool in this package can be used without it
+PLATFORMS = ["sensor", "switch"]
 
 _LOGGER = logging.getLogger(__name__)
 
+# Worker threads of the polling engine, see engine.py
+MAX_IO_THREADS = 16
+
+
+def __getattr__(name: str):
+    # HA looks the schema up on the module, building it on access keeps voluptuous
+    # out of the imports of the command line tool
+    if name == "CONFIG_SCHEMA":
+        import voluptuous as vol
+
+        return vol.Schema(
+            {
+                DOMAIN: vol.Schema(
+                    {
+                        vol.Optional(CONF_IO_THREADS, default=0): vol.All(
+                            vol.Coerce(int), vol.Range(min=0, max=MAX_IO_THREADS)
+                        )
+                    }
+                )
+            },
+            extra=vol.ALLOW_EXTRA,
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    from .coordinator import ProtectionLevels
+    from .view import WhatsminerMetricsView
+    from .websocket_api import async_register_websocket_commands
+
+    cache = MetricsCache()
+    hass.data.setdefault(DOMAIN, {})[EXPORTER] = cache
+    hass.data[DOMAIN][FLEET] = FleetAggregator()
+    hass.data[DOMAIN][PROTECTION_LEVELS] = await ProtectionLevels.async_load(hass)
+    hass.http.register_view(WhatsminerMetricsView(cache))
+    async_register_websocket_commands(hass)
+
+    io_threads = config.get(DOMAIN, {}).get(CONF_IO_THREADS, 0)
+    if io_threads > 0:
+        from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+
+        engine = PollingEngine(hass.loop, io_threads)
+        engine.start()
+        hass.data[DOMAIN][ENGINE] = engine
+
+        async def stop_engine(event):
+            await hass.async_add_executor_job(engine.stop)
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stop_engine)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    miner_coordinator = WhatsminerCoordinator(hass, entry)
-    await miner_coordinator.async_refresh()
-    hass.data.setdefault(DOMAIN, {}).setdefault(entry.entry_id, {})[
-        COORDINATOR
-    ] = miner_coordinator
+    from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+    from .coordinator import WhatsminerCoordinator
+
+    miner_coordinator = WhatsminerCoordinator(
+        hass,
+        entry,
+        hass.data[DOMAIN][PROTECTION_LEVELS],
+        hass.data[DOMAIN].get(ENGINE),
+    )
+    mac = miner_coordinator.device_mac
+    cache: MetricsCache = hass.data[DOMAIN][EXPORTER]
+    fleet: FleetAggregator = hass.data[DOMAIN][FLEET]
+
+    def publish():
+        online = miner_coordinator.online_data
+        summary = None if online is None else online.summary
+        fleet.update(mac, summary)
+        labels = {
+            "mac": mac,
+            "host": miner_coordinator.device_host,
+            "model": miner_coordinator.device_model or "",
+        }
+        cache.update(
+            mac, labels, None if summary is None else dataclasses.asdict(summary)
+        )
+        async_dispatcher_send(hass, SIGNAL_MINER_UPDATED, mac, miner_coordinator)
+
+    entry.async_on_unload(miner_coordinator.async_add_listener(publish))
+    entry.async_on_unload(lambda: cache.remove(mac))
+    entry.async_on_unload(lambda: fleet.remove(mac))
+    entry.async_on_unload(
+        lambda: async_dispatcher_send(hass, SIGNAL_MINER_UPDATED, mac, None)
+    )
+
+    hass.data[DOMAIN].setdefault(entry.entry_id, {})[COORDINATOR] = miner_coordinator
     hass.config_entries.async_setup_platforms(entry, PLATFORMS)
-    # entry.async_on_unload(entry.add_update_listener(async_update_options))
+
+    # Setup does not wait for the miner: entities start out with their restored
+    # state and the first refresh of every entry runs concurrently in the background
+    first_refresh = hass.async_create_task(_async_first_refresh(miner_coordinator))
+    entry.async_on_unload(first_refresh.cancel)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
     return True
 
 
+async def _async_first_refresh(coordinator) -> None:
+    try:
+        await asyncio.wait_for(coordinator.async_refresh(), FIRST_REFRESH_TIMEOUT)
+    except asyncio.TimeoutError:
+        _LOGGER.info(
+            "Miner %s did not answer within %ss, continuing with regular polling",
+            coordinator.device_host,
+            FIRST_REFRESH_TIMEOUT,
+        )
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
@@ -36,5 +151,5 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
-# async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
-#    await hass.config_entries.async_reload(entry.entry_id)
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await hass.config_entries.async_reload(entry.entry_id)
@@ -10,12 +10,16 @@ import datetime
 import hashlib
 import json
 import logging
+import random
 import re
 from base64 import b64decode
-from typing import Any, Dict, Optional, List, cast
+from collections import Counter
+from typing import Any, Dict, Optional, List, Tuple, TYPE_CHECKING
 
-from Crypto.Cipher import AES
-from passlib.hash import md5_crypt
+from .protocol import DEFAULT_ADAPTER, ProtocolAdapter, select_adapter
+
+if TYPE_CHECKING:
+    from .capture import TrafficRecorder
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +68,46 @@ class MinerOffline(WhatsminerException):
     pass
 
 
+class UnsupportedVersion(WhatsminerException):
+    pass
+
+
+class EmptyResponse(InvalidResponse):
+    pass
+
+
+# Plain read commands which can safely be sent again if the exchange failed
+IDEMPOTENT_COMMANDS = {
+    "summary",
+    "status",
+    "devdetails",
+    "pools",
+    "edevs",
+    "get_psu",
+    "get_version",
+    "get_miner_info",
+}
+
+# Failures of the connection which are worth another attempt
+TRANSIENT_ERRORS = (
+    ConnectionResetError,
+    BrokenPipeError,
+    asyncio.IncompleteReadError,
+    EmptyResponse,
+)
+
+
+@dataclasses.dataclass
+class RetryPolicy(object):
+    attempts: int = 3
+    base_delay: float = 0.1
+    max_delay: float = 0.5
+
+    def delay(self, retry: int) -> float:
+        # Full jitter, so miners behind the same flaky switch do not retry in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
 def _check_response(message, response):
     if "STATUS" not in response:
         raise InvalidResponse(response)
@@ -86,10 +130,36 @@ def _check_response(message, response):
         raise InvalidResponse(response)
 
 
+def _load_response(response: str) -> Dict:
+    if response.strip() == "Socket connect failed: Connection refused":
+        raise MinerOffline()
+    try:
+        # Some firmware versions emit a trailing comma in objects
+        return json.loads(response.replace(",}", "}"))
+    except json.JSONDecodeError as error:
+        raise ValueError(f"Failed to parse response {response}") from error
+
+
 class WhatsminerMachine(object):
-    def __init__(self, host: str, port: int = 4028, admin_password: str = None):
+    """
+    Not thread-safe: the token and the cipher are shared by all commands, so a
+    machine must only be used from one event loop
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 4028,
+        admin_password: str = None,
+        recorder: Optional["TrafficRecorder"] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         self.host = host
         self.port = port
+        self.recorder = recorder
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Number of retries per command, for diagnostics
+        self.retries: Counter = Counter()
         self._admin_password = admin_password
         self._token = None
         self._token_time = None
@@ -105,25 +175,16 @@ class WhatsminerMachine(object):
             if expect_response:
                 response = (await r.readline()).decode("utf-8").strip()
                 logger.debug("Received response %s", response)
-                return response.replace(",}", "}")
+                return response
         finally:
             w.close()
 
-    async def communicate(
-        self,
-        cmd: str,
-        additional: Optional[Dict[str, Any]] = None,
-        encrypted=False,
-        expect_response=True,
-    ) -> Optional[Dict]:
-        if additional:
-            data = dict(additional)
-        else:
-            data = {}
-        data["cmd"] = cmd
-        if encrypted:
-            data["token"] = await self._get_token()
-
+    async def _exchange(
+        self, data: Dict[str, Any], encrypted: bool, expect_response: bool
+    ) -> Optional[str]:
+        """
+        Sends the command and returns the plaintext response, decrypted if necessary
+        """
         plain_message = json.dumps(data)
         if encrypted:
             enc_str = (
@@ -136,34 +197,65 @@ class WhatsminerMachine(object):
             message = plain_message
 
         response = await self._communicate_raw(message, expect_response)
-        if not expect_response:
-            return None
+        if not expect_response or not encrypted:
+            return response
 
-        if response.strip() == "Socket connect failed: Connection refused":
-            raise MinerOffline()
+        json_response = _load_response(response)
+        if json_response.get("Code", 0) == 23:
+            raise InvalidAuth()
         try:
-            json_response = json.loads(response)
-        except json.JSONDecodeError as error:
-            raise ValueError(f"Failed to parse response {response}") from error
+            resp_plaintext: str = (
+                self._cipher.decrypt(b64decode(json_response["enc"]))
+                .decode("utf-8")
+                .rstrip("\0\n ")
+            )
+        except KeyError:
+            raise InvalidResponse(response)
+        if not resp_plaintext:
+            raise InvalidResponse()
+        return resp_plaintext
 
+    async def communicate(
+        self,
+        cmd: str,
+        additional: Optional[Dict[str, Any]] = None,
+        encrypted=False,
+        expect_response=True,
+    ) -> Optional[Dict]:
+        if additional:
+            data = dict(additional)
+        else:
+            data = {}
+        data["cmd"] = cmd
         if encrypted:
-            if json_response.get("Code", 0) == 23:
-                raise InvalidAuth()
+            data["token"] = await self._get_token()
+
+        # Control commands are never repeated, they may have been executed already
+        retryable = not encrypted and cmd in IDEMPOTENT_COMMANDS
+        attempt = 1
+        while True:
             try:
-                resp_plaintext: str = (
-                    self._cipher.decrypt(b64decode(json_response["enc"]))
-                    .decode("utf-8")
-                    .rstrip("\0\n ")
+                response = await self._exchange(data, encrypted, expect_response)
+                if self.recorder is not None:
+                    self.recorder.record(data, encrypted, response)
+                if expect_response and not response:
+                    raise EmptyResponse(cmd)
+                break
+            except TRANSIENT_ERRORS as error:
+                if not retryable or attempt >= self.retry_policy.attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.debug(
+                    "Retrying %s on %s in %.2fs: %r", cmd, self.host, delay, error
                 )
-                if not resp_plaintext:
-                    raise InvalidResponse()
-                plain_response = json.loads(resp_plaintext)
-                _check_response(plain_message, plain_response)
-                return plain_response
-            except KeyError:
-                raise InvalidResponse(response)
-
-        _check_response(message, json_response)
+                self.retries[cmd] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+        if not expect_response:
+            return None
+
+        json_response = _load_response(response)
+        _check_response(json.dumps(data), json_response)
         return json_response
 
     async def _get_token(self) -> str:
@@ -179,6 +271,10 @@ class WhatsminerMachine(object):
         Final assembly: enc|base64(aes256("token,sign|set_led|auto", $aes_key))
         """
 
+        # The crypto dependencies are only needed for encrypted commands, plain
+        # polling does not pay for importing them
+        from Crypto.Cipher import AES
+
         now = datetime.datetime.now()
 
         if (
@@ -188,7 +284,7 @@ class WhatsminerMachine(object):
             return self._token
 
         message = json.dumps({"cmd": "get_token"})
-        response = json.loads(await self._communicate_raw(message))
+        response = _load_response(await self._communicate_raw(message))
         _check_response(message, response)
 
         token_info = response["Msg"]
@@ -216,7 +312,8 @@ class Summary(object):
     hash_rate_5m: float
     hash_rate_15m: float
     average_frequency: float
-    target_frequency: float
+    # Optional fields are not reported by every firmware
+    target_frequency: Optional[float]
     target_hash_rate: float
 
     accepted: int
@@ -226,16 +323,16 @@ class Summary(object):
     chip_temperature_minimum: float
     chip_temperature_maximum: float
     chip_temperature_average: float
-    environment_temperature: float
+    environment_temperature: Optional[float]
     fan_speed_in: int
     fan_speed_out: int
 
     power: int
     power_rate: float
-    power_mode: str
+    power_mode: Optional[str]
 
     pool_rejected_percent: float
-    pool_stale_percent: float
+    pool_stale_percent: Optional[float]
 
     uptime: int
     security_mode: bool
@@ -291,11 +388,48 @@ class MinerStatus(object):
 class WhatsminerApi(object):
     def __init__(self, machine: WhatsminerMachine):
         self.machine = machine
+        self.adapter: Optional[ProtocolAdapter] = None
+        self.version: Optional[Version] = None
 
-    async def get_device_details(self) -> List[DeviceDetails]:
-        response = await self.machine.communicate(
-            "devdetails", encrypted=False, expect_response=True
+    @property
+    def _protocol(self) -> ProtocolAdapter:
+        return self.adapter or DEFAULT_ADAPTER
+
+    async def negotiate(self) -> ProtocolAdapter:
+        """
+        Selects the protocol adapter matching the API version of the miner. The
+        result is cached, later calls do not contact the miner.
+        """
+        if self.adapter is None:
+            version = await self.get_version()
+            self.version = version
+            adapter = select_adapter(version.api_version)
+            if adapter is None:
+                raise UnsupportedVersion(version.api_version)
+            logger.debug(
+                "Using protocol %s for %s (%s)",
+                adapter.name,
+                self.machine.host,
+                version.api_version,
+            )
+            self.adapter = adapter
+        return self.adapter
+
+    async def _read(self, command: str) -> Dict:
+        return await self.machine.communicate(
+            self._protocol.command(command), encrypted=False, expect_response=True
         )
+
+    async def _control(self, command: str, additional: Optional[Dict] = None):
+        await self.machine.communicate(
+            self._protocol.command(command),
+            additional=additional,
+            encrypted=True,
+            expect_response=True,
+        )
+
+    async def get_device_details(self) -> List[DeviceDetails]:
+        response = await self._read("device_details")
         try:
             return [
                 DeviceDetails(
@@ -312,46 +446,24 @@ class WhatsminerApi(object):
             raise InvalidResponse() from error
 
     async def get_summary(self) -> Summary:
-        response = await self.machine.communicate(
-            "summary", encrypted=False, expect_response=True
-        )
+        summary, _ = await self.get_summary_with_status()
+        return summary
+
+    async def get_summary_with_status(self) -> Tuple[Summary, Optional[MinerStatus]]:
+        """
+        Also returns the miner status if the firmware includes it in the summary
+        """
+        response = await self._read("summary")
         try:
             data = response["SUMMARY"][0]
-            return Summary(
-                elapsed=data["Elapsed"],
-                average_hash_rate=round(data["MHS av"] / 1000),
-                hash_rate_5s=round(data["MHS 5s"] / 1000),
-                hash_rate_1m=round(data["MHS 1m"] / 1000),
-                hash_rate_5m=round(data["MHS 5m"] / 1000),
-                hash_rate_15m=round(data["MHS 15m"] / 1000),
-                accepted=data["Accepted"],
-                rejected=data["Rejected"],
-                temperature=data["Temperature"],
-                average_frequency=data["freq_avg"],
-                fan_speed_in=data["Fan Speed In"],
-                fan_speed_out=data["Fan Speed Out"],
-                power=data["Power"],
-                power_rate=data["Power_RT"],
-                pool_rejected_percent=data["Pool Rejected%"],
-                pool_stale_percent=data["Pool Stale%"],
-                uptime=data["Uptime"],
-                security_mode=data["Security Mode"] == 0,
-                target_frequency=data["Target Freq"],
-                target_hash_rate=data["Target MHS"] / 1000,
-                environment_temperature=data["Env Temp"],
-                power_mode=data["Power Mode"],
-                chip_temperature_minimum=data["Chip Temp Min"],
-                chip_temperature_maximum=data["Chip Temp Max"],
-                chip_temperature_average=data["Chip Temp Avg"],
-                mac=data["MAC"],
-            )
+            summary = Summary(**self._protocol.parse_summary(data))
         except KeyError as error:
             raise InvalidResponse() from error
+        status = self._protocol.parse_summary_status(data)
+        return summary, None if status is None else MinerStatus(**status)
 
     async def get_psu(self) -> PowerUnitDetails:
-        response = await self.machine.communicate(
-            "get_psu", encrypted=False, expect_response=True
-        )
+        response = await self._read("psu")
         try:
             data = response["Msg"]
             return PowerUnitDetails(
@@ -369,9 +481,7 @@ class WhatsminerApi(object):
             raise InvalidResponse() from error
 
     async def get_version(self) -> Version:
-        response = await self.machine.communicate(
-            "get_version", encrypted=False, expect_response=True
-        )
+        response = await self._read("version")
         try:
             data = response["Msg"]
             return Version(api_version=data["api_ver"], firmware_version=data["fw_ver"])
@@ -397,72 +507,45 @@ class WhatsminerApi(object):
     #         raise InvalidResponse() from error
 
     async def get_status(self) -> MinerStatus:
-        response = await self.machine.communicate(
-            "status", encrypted=False, expect_response=True
-        )
+        response = await self._read("status")
         try:
-            data = response["Msg"]
-            return MinerStatus(
-                miner_online=data["btmineroff"] == "false",
-                firmware_version=cast(str, data["Firmware Version"]).strip("'"),
-            )
+            return MinerStatus(**self._protocol.parse_status(response["Msg"]))
         except KeyError as error:
             raise InvalidResponse() from error
 
     async def restart_miner(self):
-        await self.machine.communicate(
-            "restart_btminer", encrypted=True, expect_response=True
-        )
+        await self._control("restart")
 
     async def power_off_miner(self):
-        await self.machine.communicate(
-            "power_off",
-            additional={"respbefore": "true"},
-            encrypted=True,
-            expect_response=True,
-        )
+        await self._control("power_off", additional={"respbefore": "true"})
 
     async def power_on_miner(self):
-        await self.machine.communicate("power_on", encrypted=True, expect_response=True)
+        await self._control("power_on")
 
     async def set_power_mode(self):
-        await self.machine.communicate(
-            "set_lower_power", encrypted=True, expect_response=True
-        )
+        await self._control("low_power")
 
     async def reboot(self):
-        await self.machine.communicate("reboot", encrypted=True, expect_response=True)
+        await self._control("reboot")
 
     async def set_target_frequency(self, percent: int):
         if not -10 <= percent <= 100:
             raise ValueError
-        await self.machine.communicate(
-            "set_target_freq",
-            additional={"percent": str(percent)},
-            encrypted=True,
-            expect_response=True,
-        )
+        await self._control("target_frequency", additional={"percent": str(percent)})
 
     async def set_power_percent(self, percent: int):
         if not 0 <= percent <= 100:
             raise ValueError
-        await self.machine.communicate(
-            "set_power_pct",
-            additional={"percent": str(percent)},
-            encrypted=True,
-            expect_response=True,
-        )
+        await self._control("power_percent", additional={"percent": str(percent)})
 
     async def set_miner_fast_boot(self, enable: bool):
-        await self.machine.communicate(
-            "enable_cgminer_fast_boot" if enable else "disable_cgminer_fast_boot",
-            encrypted=True,
-            expect_response=True,
-        )
+        await self._control("enable_fast_boot" if enable else "disable_fast_boot")
 
 
 # ================================ misc helpers ================================
 def crypt(word, salt):
+    from passlib.hash import md5_crypt
+
     standard_salt = re.compile("\\s*\\$(\\d+)\\$([\\w./]*)\\$")
     match = standard_salt.match(salt)
     if not match:
@@ -0,0 +1,128 @@
+"""
+Recording and replay of the traffic with a miner.
+
+Captures are NDJSON files with one exchange per line: the offset in seconds since
+the recording started, whether the command was encrypted, the request with
+secrets redacted and the plaintext response exactly as received (decrypted, but
+before any clean-up), e.g.
+
+    {"t":0.012,"enc":0,"req":{"cmd":"summary"},"resp":"{\"STATUS\":\"S\",...}"}
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, TextIO
+
+from .api import WhatsminerMachine, WhatsminerException
+
+REDACTED = "**REDACTED**"
+SECRET_KEYS = {"token", "password", "passwd", "old", "new"}
+
+
+class ReplayExhausted(WhatsminerException):
+    pass
+
+
+def redact(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: REDACTED if key in SECRET_KEYS else value for key, value in data.items()
+    }
+
+
+def _request_key(request: Dict[str, Any]) -> str:
+    return json.dumps(redact(request), sort_keys=True)
+
+
+class TrafficRecorder(object):
+    """
+    The file is only opened by the first exchange and can be closed in between,
+    e.g. after every poll, the next exchange opens it again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._start = time.monotonic()
+        self._file: Optional[TextIO] = None
+
+    def record(self, request: Dict[str, Any], encrypted: bool, response: Optional[str]):
+        entry = {
+            "t": round(time.monotonic() - self._start, 3),
+            "enc": int(encrypted),
+            "req": redact(request),
+            "resp": response,
+        }
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class ReplayMachine(WhatsminerMachine):
+    """
+    Serves recorded responses instead of talking to a miner. Each request gets the
+    recorded responses to the same request in their original order. With a `speed`,
+    responses are delayed to match the recorded timing (2.0 replays twice as fast),
+    otherwise they are returned immediately.
+    """
+
+    def __init__(
+        self,
+        entries: List[Dict[str, Any]],
+        speed: Optional[float] = None,
+        repeat: bool = False,
+        host: str = "replay",
+        port: int = 4028,
+    ):
+        super(ReplayMachine, self).__init__(host, port)
+        self.speed = speed
+        self.repeat = repeat
+        self._entries = entries
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._start: Optional[float] = None
+        self._offset = 0.0
+        self._load()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ReplayMachine":
+        return cls(load_capture(path), **kwargs)
+
+    def _load(self):
+        for entry in self._entries:
+            self._queues[_request_key(entry["req"])].append(entry)
+
+    async def _get_token(self) -> str:
+        return REDACTED
+
+    async def _exchange(
+        self, data: Dict[str, Any], encrypted: bool, expect_response: bool
+    ) -> Optional[str]:
+        queue = self._queues.get(_request_key(data))
+        if not queue and self.repeat and self._entries:
+            # Start over, later timestamps continue after the last recorded one
+            self._offset += self._entries[-1]["t"]
+            self._queues.clear()
+            self._load()
+            queue = self._queues.get(_request_key(data))
+        if not queue:
+            raise ReplayExhausted(data.get("cmd"))
+        entry = queue.popleft()
+
+        if self.speed:
+            now = time.monotonic()
+            if self._start is None:
+                self._start = now - (self._offset + entry["t"]) / self.speed
+            delay = self._start + (self._offset + entry["t"]) / self.speed - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return entry["resp"] if expect_response else None
@@ -0,0 +1,185 @@
+"""
+Poll a fleet of miners without Home Assistant and stream the results as NDJSON, e.g.
+
+    python -m custom_components.whatsminer 10.0.0.0/24 --workers 32 --interval 30
+"""
+import argparse
+import asyncio
+import dataclasses
+import ipaddress
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .api import WhatsminerApi, WhatsminerMachine, WhatsminerException, MinerOffline
+from .capture import TrafficRecorder
+from .exporter import MetricsCache, serve
+
+logger = logging.getLogger(__name__)
+
+
+def expand_hosts(targets: Iterable[str]) -> List[Tuple[str, int]]:
+    hosts = []
+    for target in targets:
+        host, _, port = target.partition(":")
+        port = int(port) if port else 4028
+        if "/" in host:
+            network = ipaddress.ip_network(host, strict=False)
+            hosts.extend((str(address), port) for address in network.hosts())
+        else:
+            hosts.append((host, port))
+    return hosts
+
+
+async def poll_miner(machine: WhatsminerMachine, timeout: float) -> Dict[str, Any]:
+    record: Dict[str, Any] = {
+        "host": machine.host,
+        "port": machine.port,
+        "time": time.time(),
+    }
+    api = WhatsminerApi(machine)
+    try:
+        await asyncio.wait_for(api.negotiate(), timeout)
+        details = await asyncio.wait_for(api.get_device_details(), timeout)
+        summary = await asyncio.wait_for(api.get_summary(), timeout)
+    except MinerOffline:
+        record["status"] = "offline"
+    except (asyncio.TimeoutError, OSError) as error:
+        record["status"] = "unreachable"
+        record["error"] = str(error) or type(error).__name__
+    except (WhatsminerException, ValueError) as error:
+        record["status"] = "error"
+        record["error"] = repr(error)
+    else:
+        record["status"] = "online"
+        record["model"] = details[0].model if details else None
+        record["summary"] = dataclasses.asdict(summary)
+        record["version"] = dataclasses.asdict(api.version)
+    return record
+
+
+def write_record(record: Dict[str, Any]):
+    sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+    sys.stdout.flush()
+
+
+def export_record(cache: MetricsCache, record: Dict[str, Any]):
+    summary = record.get("summary")
+    labels = {
+        "mac": summary["mac"] if summary else "",
+        "host": record["host"],
+        "model": record.get("model") or "",
+    }
+    cache.update(f"{record['host']}:{record['port']}", labels, summary)
+
+
+def record_handler(
+    cache: Optional[MetricsCache],
+) -> Callable[[Dict[str, Any]], None]:
+    if cache is None:
+        return write_record
+
+    def on_record(record: Dict[str, Any]):
+        write_record(record)
+        export_record(cache, record)
+
+    return on_record
+
+
+async def poll_fleet(
+    machines: List[WhatsminerMachine],
+    workers: int,
+    timeout: float,
+    on_record: Callable[[Dict[str, Any]], None],
+):
+    """
+    Polls all machines with at most `workers` connections in flight, handing out
+    each record as soon as its miner answered.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for machine in machines:
+        queue.put_nowait(machine)
+
+    async def worker():
+        while True:
+            try:
+                machine = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                record = await poll_miner(machine, timeout)
+            finally:
+                # Keeps at most one capture file per worker open
+                if machine.recorder is not None:
+                    machine.recorder.close()
+            on_record(record)
+
+    await asyncio.gather(*(worker() for _ in range(min(workers, len(machines)))))
+
+
+async def run(arguments: argparse.Namespace):
+    machines = []
+    for host, port in expand_hosts(arguments.targets):
+        recorder = None
+        if arguments.record is not None:
+            path = os.path.join(arguments.record, f"{host}_{port}.ndjson")
+            recorder = TrafficRecorder(path)
+        machines.append(WhatsminerMachine(host, port, arguments.password, recorder))
+
+    cache = None
+    if arguments.metrics_port is not None:
+        cache = MetricsCache()
+        await serve(cache, arguments.metrics_host, arguments.metrics_port)
+    on_record = record_handler(cache)
+
+    try:
+        while True:
+            start = time.monotonic()
+            await poll_fleet(machines, arguments.workers, arguments.timeout, on_record)
+            if arguments.interval is None:
+                return
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(max(0.0, arguments.interval - elapsed))
+    finally:
+        for machine in machines:
+            if machine.recorder is not None:
+                machine.recorder.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_components.whatsminer",
+        description="Poll Whatsminer machines and print one JSON record per miner",
+    )
+    parser.add_argument(
+        "targets", nargs="+", help="host[:port] or network in CIDR notation"
+    )
+    parser.add_argument("--password", default=None, help="admin password")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument(
+        "--interval", type=float, default=None, help="poll continuously (seconds)"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve Prometheus metrics on this port (implies --interval)",
+    )
+    parser.add_argument("--metrics-host", default="0.0.0.0")
+    parser.add_argument(
+        "--record", default=None, help="directory to capture the miner traffic to"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    arguments = parser.parse_args(argv)
+    if arguments.metrics_port is not None and arguments.interval is None:
+        arguments.interval = 30
+
+    logging.basicConfig(level=logging.DEBUG if arguments.verbose else logging.WARNING)
+    try:
+        asyncio.run(run(arguments))
+    except KeyboardInterrupt:
+        pass
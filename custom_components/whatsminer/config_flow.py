@@ -1,11 +1,15 @@
 import asyncio
+import csv
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import aiohttp
+import async_timeout
 import voluptuous as vol
+import yaml
 from homeassistant import config_entries
-from homeassistant.data_entry_flow import FlowResult
+from homeassistant.core import callback
+from homeassistant.data_entry_flow import FlowResult, FlowResultType
 from homeassistant.helpers.device_registry import format_mac
 
 from .api import (
@@ -15,59 +19,74 @@ from .api import (
     TokenExceeded,
     DecodeError,
     MinerOffline,
+    UnsupportedVersion,
     WhatsminerApi,
 )
-from .const import DOMAIN, CONF_HOST, CONF_PORT, CONF_PASSWORD, CONF_MAC
+from .const import (
+    DOMAIN,
+    CONF_HOST,
+    CONF_PORT,
+    CONF_PASSWORD,
+    CONF_MAC,
+    CONF_PROTECTION,
+    CONF_MAX_CHIP_TEMPERATURE,
+    CONF_MAX_ENVIRONMENT_TEMPERATURE,
+    CONF_FAN_STALL_DETECTION,
+    CONF_PARALLELISM,
+    CONF_STALE_TOLERANCE,
+)
+from .protection import ProtectionSettings
 
 _LOGGER = logging.getLogger(__name__)
 
+CONF_PATH = "path"
+
+# Miners validated concurrently during an inventory import
+INVENTORY_WORKERS = 16
+# Seconds a miner may take to be validated, unreachable hosts would otherwise
+# only fail after the connect timeout of the OS
+VALIDATION_TIMEOUT = 15
+
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self):
+        self._inventory: List[Dict[str, Any]] = []
+        self._import_task: Optional[asyncio.Task] = None
+        self._report: List[str] = []
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        return OptionsFlow(config_entry)
+
     async def async_step_user(
         self, user_input: Optional[Dict[str, Any]] = None
+    ) -> FlowResult:
+        return self.async_show_menu(step_id="user", menu_options=["manual", "inventory"])
+
+    async def async_step_manual(
+        self, user_input: Optional[Dict[str, Any]] = None
     ) -> FlowResult:
         errors = {}
         if user_input is not None:
-            host, port, password = (
-                user_input[CONF_HOST],
-                user_input[CONF_PORT],
-                user_input[CONF_PASSWORD],
-            )
-            machine = WhatsminerMachine(host, port, password)
-            api = WhatsminerApi(machine)
             try:
-                await machine.check()
-                summary = await api.get_summary()
-                version = await api.get_version()
-            except (asyncio.TimeoutError, aiohttp.ClientError):
-                _LOGGER.info("Cannot connect to miner")
-                errors["base"] = "cannot_connect"
-            except DecodeError:
-                errors["base"] = "invalid_auth"
-            except ApiPermissionDenied:
-                errors["base"] = "api_denied"
-            except TokenExceeded:
-                errors["base"] = "token_exceeded"
-            except MinerOffline:
-                errors["base"] = "miner_offline"
-            except WhatsminerException as e:
-                _LOGGER.info("Unexpected miner exception", exc_info=e)
-                errors["base"] = "unknown"
-            except Exception as e:
-                _LOGGER.warning("Unknown error", exc_info=e)
-                errors["base"] = "unknown"
+                mac_address = await validate_miner(
+                    user_input[CONF_HOST],
+                    user_input[CONF_PORT],
+                    user_input[CONF_PASSWORD],
+                )
+            except (Exception, WhatsminerException) as error:
+                errors["base"] = validation_error(error)
             else:
-                if version.api_version != "whatsminer v1.4.0":
-                    errors["base"] = "unsupported_version"
-                else:
-                    mac_address = format_mac(summary.mac)
-                    await self.async_set_unique_id(mac_address)
-                    self._abort_if_unique_id_configured()
-                    return self.async_create_entry(
-                        title="Whatsminer", data={CONF_MAC: mac_address, **user_input}
-                    )
+                await self.async_set_unique_id(mac_address)
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title="Whatsminer", data={CONF_MAC: mac_address, **user_input}
+                )
 
         data_schema = {
             vol.Required(CONF_HOST): str,
@@ -76,5 +95,211 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         }
 
         return self.async_show_form(
-            step_id="user", data_schema=vol.Schema(data_schema), errors=errors
+            step_id="manual", data_schema=vol.Schema(data_schema), errors=errors
+        )
+
+    async def async_step_inventory(
+        self, user_input: Optional[Dict[str, Any]] = None
+    ) -> FlowResult:
+        errors = {}
+        if user_input is not None:
+            path = self.hass.config.path(user_input[CONF_PATH])
+            try:
+                rows = await self.hass.async_add_executor_job(read_inventory, path)
+            except (OSError, ValueError, yaml.YAMLError) as error:
+                _LOGGER.info("Cannot read inventory %s: %s", path, error)
+                errors["base"] = "inventory_unreadable"
+            else:
+                self._inventory = rows
+                return await self.async_step_import_inventory()
+
+        return self.async_show_form(
+            step_id="inventory",
+            data_schema=vol.Schema({vol.Required(CONF_PATH): str}),
+            errors=errors,
+        )
+
+    async def async_step_import_inventory(
+        self, user_input: Optional[Dict[str, Any]] = None
+    ) -> FlowResult:
+        # Validating hundreds of miners takes minutes, the frontend shows the
+        # progress meanwhile and is notified once the task finished
+        if self._import_task is None:
+            self._import_task = self.hass.async_create_task(self._async_run_import())
+            return self.async_show_progress(
+                step_id="import_inventory",
+                progress_action="import_inventory",
+                description_placeholders={"count": str(len(self._inventory))},
+            )
+        return self.async_show_progress_done(next_step_id="inventory_report")
+
+    async def async_step_inventory_report(
+        self, user_input: Optional[Dict[str, Any]] = None
+    ) -> FlowResult:
+        return self.async_abort(
+            reason="inventory_imported",
+            description_placeholders={"report": "\n".join(self._report)},
         )
+
+    async def _async_run_import(self):
+        try:
+            self._report = await self._async_import_inventory(self._inventory)
+        except (Exception, WhatsminerException) as error:
+            _LOGGER.warning("Inventory import failed", exc_info=error)
+            self._report = [f"Import failed: {error!r}"]
+        finally:
+            self.hass.async_create_task(
+                self.hass.config_entries.flow.async_configure(flow_id=self.flow_id)
+            )
+
+    async def _async_import_inventory(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """
+        Validates all rows concurrently and runs an import flow for each miner
+        which is not configured yet. Returns one report line per row.
+        """
+        semaphore = asyncio.Semaphore(INVENTORY_WORKERS)
+        configured = self._async_current_ids()
+
+        async def add(row: Dict[str, Any]) -> str:
+            async with semaphore:
+                try:
+                    mac_address = await validate_miner(
+                        row[CONF_HOST], row[CONF_PORT], row[CONF_PASSWORD]
+                    )
+                except (Exception, WhatsminerException) as error:
+                    return validation_error(error)
+            if mac_address in configured:
+                return "already configured"
+            configured.add(mac_address)
+            flow_result = await self.hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={"source": config_entries.SOURCE_IMPORT},
+                data={CONF_MAC: mac_address, **row},
+            )
+            if flow_result["type"] == FlowResultType.CREATE_ENTRY:
+                return "added"
+            return f"not added ({flow_result.get('reason', flow_result['type'])})"
+
+        results = await asyncio.gather(*(add(row) for row in rows))
+        return [
+            f"{row[CONF_HOST]}:{row[CONF_PORT]}: {result}"
+            for row, result in zip(rows, results)
+        ]
+
+    async def async_step_import(self, import_data: Dict[str, Any]) -> FlowResult:
+        # Only used for inventory rows, which were validated already
+        await self.async_set_unique_id(import_data[CONF_MAC])
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(title="Whatsminer", data=import_data)
+
+
+async def validate_miner(host: str, port: int, password: str) -> str:
+    """
+    Checks the API access and version, returns the MAC address. Every request is
+    a connection of its own, the miner closes it after answering.
+
+    The token request does not prove the password, the key is derived locally and
+    only an encrypted command would fail on a wrong one. It is kept because it is
+    the only request that fails when the write API of the miner is disabled or its
+    token budget is exhausted, which the switch and the protection depend on.
+    """
+    machine = WhatsminerMachine(host, port, password)
+    api = WhatsminerApi(machine)
+    async with async_timeout.timeout(VALIDATION_TIMEOUT):
+        await machine.check()
+        await api.negotiate()
+        summary = await api.get_summary()
+    return format_mac(summary.mac)
+
+
+def validation_error(error: BaseException) -> str:
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, OSError)):
+        _LOGGER.info("Cannot connect to miner")
+        return "cannot_connect"
+    if isinstance(error, DecodeError):
+        return "invalid_auth"
+    if isinstance(error, ApiPermissionDenied):
+        return "api_denied"
+    if isinstance(error, TokenExceeded):
+        return "token_exceeded"
+    if isinstance(error, MinerOffline):
+        return "miner_offline"
+    if isinstance(error, UnsupportedVersion):
+        return "unsupported_version"
+    if isinstance(error, WhatsminerException):
+        _LOGGER.info("Unexpected miner exception", exc_info=error)
+        return "unknown"
+    _LOGGER.warning("Unknown error", exc_info=error)
+    return "unknown"
+
+
+def read_inventory(path: str) -> List[Dict[str, Any]]:
+    """
+    Reads host, port and password of each miner from a CSV file with a header row
+    or a YAML list of mappings
+    """
+    with open(path, encoding="utf-8") as file:
+        if path.endswith((".yaml", ".yml")):
+            entries = yaml.safe_load(file) or []
+        else:
+            entries = list(csv.DictReader(file))
+    if not isinstance(entries, list):
+        raise ValueError("Inventory must be a list of miners")
+
+    rows = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get(CONF_HOST):
+            raise ValueError(f"Invalid inventory row {entry}")
+        rows.append(
+            {
+                CONF_HOST: str(entry[CONF_HOST]).strip(),
+                CONF_PORT: int(entry.get(CONF_PORT) or 4028),
+                CONF_PASSWORD: str(entry.get(CONF_PASSWORD) or ""),
+            }
+        )
+    return rows
+
+
+class OptionsFlow(config_entries.OptionsFlow):
+    def __init__(self, config_entry: config_entries.ConfigEntry):
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: Optional[Dict[str, Any]] = None
+    ) -> FlowResult:
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        defaults = ProtectionSettings()
+        data_schema = {
+            vol.Optional(
+                CONF_PROTECTION, default=options.get(CONF_PROTECTION, False)
+            ): bool,
+            vol.Optional(
+                CONF_MAX_CHIP_TEMPERATURE,
+                default=options.get(
+                    CONF_MAX_CHIP_TEMPERATURE, defaults.max_chip_temperature
+                ),
+            ): vol.Coerce(float),
+            vol.Optional(
+                CONF_MAX_ENVIRONMENT_TEMPERATURE,
+                default=options.get(
+                    CONF_MAX_ENVIRONMENT_TEMPERATURE,
+                    defaults.max_environment_temperature,
+                ),
+            ): vol.Coerce(float),
+            vol.Optional(
+                CONF_FAN_STALL_DETECTION,
+                default=options.get(
+                    CONF_FAN_STALL_DETECTION, defaults.detect_fan_stall
+                ),
+            ): bool,
+            vol.Optional(
+                CONF_PARALLELISM, default=options.get(CONF_PARALLELISM, 1)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=4)),
+            vol.Optional(
+                CONF_STALE_TOLERANCE, default=options.get(CONF_STALE_TOLERANCE, 30)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+        }
+        return self.async_show_form(step_id="init", data_schema=vol.Schema(data_schema))
@@ -6,3 +6,23 @@ CONF_HOST = "host"
 CONF_PORT = "port"
 CONF_PASSWORD = "password"
 CONF_MAC = "mac"
+
+CONF_PROTECTION = "protection"
+CONF_MAX_CHIP_TEMPERATURE = "max_chip_temperature"
+CONF_MAX_ENVIRONMENT_TEMPERATURE = "max_environment_temperature"
+CONF_FAN_STALL_DETECTION = "fan_stall_detection"
+CONF_PARALLELISM = "parallelism"
+CONF_STALE_TOLERANCE = "stale_tolerance"
+
+EXPORTER = "exporter"
+FLEET = "fleet"
+ENGINE = "engine"
+PROTECTION_LEVELS = "protection_levels"
+
+# Dispatched with (mac, coordinator) on every update, coordinator is None on removal
+SIGNAL_MINER_UPDATED = "whatsminer_miner_updated"
+
+# YAML configuration of the integration
+CONF_IO_THREADS = "io_threads"
+
+FIRST_REFRESH_TIMEOUT = 30
@@ -1,12 +1,16 @@
+import asyncio
 import logging
+import time
 from dataclasses import dataclass
 from datetime import timedelta
-from typing import Optional
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, TypeVar
 
 import async_timeout
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
@@ -16,6 +20,7 @@ from .api import (
     WhatsminerMachine,
     WhatsminerApi,
     Summary,
+    MinerStatus,
     PowerUnitDetails,
     Version,
     WhatsminerException,
@@ -23,10 +28,67 @@ from .api import (
     DecodeError,
     MinerOffline,
 )
-from .const import DOMAIN, CONF_HOST, CONF_PORT, CONF_PASSWORD, CONF_MAC
+from .derived import DerivedMetrics, EnergyAccumulator, RollingWindow
+from .history import SampleHistory
+from .engine import EngineStopped, PollingEngine
+from .protection import ProtectionEngine, ProtectionSettings
+from .const import (
+    DOMAIN,
+    CONF_HOST,
+    CONF_PORT,
+    CONF_PASSWORD,
+    CONF_MAC,
+    CONF_PROTECTION,
+    CONF_MAX_CHIP_TEMPERATURE,
+    CONF_MAX_ENVIRONMENT_TEMPERATURE,
+    CONF_FAN_STALL_DETECTION,
+    CONF_PARALLELISM,
+    CONF_STALE_TOLERANCE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+COMMAND_SUMMARY = "summary"
+COMMAND_STATUS = "status"
+COMMAND_PSU = "psu"
+COMMAND_VERSION = "version"
+
+T = TypeVar("T")
+
+PollResult = Tuple[
+    Summary, Optional[MinerStatus], Optional[PowerUnitDetails], Optional[Version]
+]
+
+
+class ProtectionLevels(object):
+    """
+    Protection level per miner MAC, persisted so that a lowered power limit is still
+    raised again after a restart or once protection was turned off
+    """
+
+    SAVE_DELAY = 10
+
+    def __init__(self, store: Store, levels: Optional[Dict[str, int]]):
+        self._store = store
+        self._levels: Dict[str, int] = dict(levels or {})
+
+    @classmethod
+    async def async_load(cls, hass: HomeAssistant) -> "ProtectionLevels":
+        store = Store(hass, 1, f"{DOMAIN}.protection")
+        return cls(store, await store.async_load())
+
+    def get(self, mac: str) -> int:
+        return self._levels.get(mac, 0)
+
+    def set(self, mac: str, level: int):
+        if self.get(mac) == level:
+            return
+        if level:
+            self._levels[mac] = level
+        else:
+            self._levels.pop(mac, None)
+        self._store.async_delay_save(lambda: dict(self._levels), self.SAVE_DELAY)
+
 
 @dataclass
 class MinerData(object):
@@ -36,12 +98,23 @@ class MinerData(object):
 @dataclass
 class OnlineMinerData(MinerData):
     summary: Summary
-    power_unit: PowerUnitDetails
-    version: Version
+    status: Optional[MinerStatus]
+    power_unit: Optional[PowerUnitDetails]
+    version: Optional[Version]
+    derived: DerivedMetrics
+    energy: float
+    # Wall clock time the data was received
+    updated: float
 
 
 class WhatsminerCoordinator(DataUpdateCoordinator[MinerData]):
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        levels: ProtectionLevels,
+        engine: Optional[PollingEngine] = None,
+    ):
         super(WhatsminerCoordinator, self).__init__(
             hass,
             logging.getLogger(__name__),
@@ -54,35 +127,209 @@ class WhatsminerCoordinator(DataUpdateCoordinator[MinerData]):
         port = entry.data[CONF_PORT]
         password = entry.data[CONF_PASSWORD]
         self.machine = WhatsminerMachine(host, port, password)
+        # Runs all I/O with the miner on a worker loop if set. The machine is not
+        # thread-safe, go through `async_run` for every command.
+        self.engine = engine
         self.api: WhatsminerApi = WhatsminerApi(self.machine)
         self.device_host: str = host
         self.device_model: Optional[str] = None
         self.device_mac: str = entry.data[CONF_MAC]
+        self.window = RollingWindow()
+        self.history = SampleHistory()
+        self.energy = EnergyAccumulator()
+        # Commands required by the entities currently added to HA. Disabled entities
+        # are never added and disabling one removes it, so this follows the registry
+        self._consumers: Counter = Counter()
+        # Requests in flight at the same time during a poll, 1 polls sequentially
+        self.parallelism: int = entry.options.get(CONF_PARALLELISM, 1)
+        # Failed polls keep serving the last good data for this many seconds
+        self.stale_tolerance: float = entry.options.get(CONF_STALE_TOLERANCE, 30)
+        self.last_good: Optional[OnlineMinerData] = None
+        # Monotonic time of the last good data, `updated` is only for display
+        self._last_good_time: Optional[float] = None
+        # The scheduled refresh can start while the slow first refresh is still
+        # running, polls are processed one after the other
+        self._poll_lock = asyncio.Lock()
+
+        self.levels = levels
+        self.protection: Optional[ProtectionEngine] = None
+        enabled = entry.options.get(CONF_PROTECTION, False)
+        level = levels.get(self.device_mac)
+        # A disabled engine still raises a limit set before protection was disabled
+        if enabled or level:
+            defaults = ProtectionSettings()
+            settings = ProtectionSettings(
+                max_chip_temperature=entry.options.get(
+                    CONF_MAX_CHIP_TEMPERATURE, defaults.max_chip_temperature
+                ),
+                max_environment_temperature=entry.options.get(
+                    CONF_MAX_ENVIRONMENT_TEMPERATURE,
+                    defaults.max_environment_temperature,
+                ),
+                detect_fan_stall=entry.options.get(
+                    CONF_FAN_STALL_DETECTION, defaults.detect_fan_stall
+                ),
+            )
+            self.protection = ProtectionEngine(
+                self.api, self.history, settings, level=level, enabled=enabled
+            )
+
+    @property
+    def plan(self) -> Set[str]:
+        # The summary feeds the derived metrics, history and protection as well
+        plan = {COMMAND_SUMMARY}
+        plan.update(command for command, count in self._consumers.items() if count)
+        if self.protection is not None:
+            # Tells whether a miner powered off by the protection runs again
+            plan.add(COMMAND_STATUS)
+        return plan
+
+    async def async_run(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs the coroutine created by `factory` on the loop which owns the machine
+        """
+        if self.engine is None:
+            return await factory()
+        return await self.engine.run(self.device_host, factory)
+
+    @property
+    def online_data(self) -> Optional[OnlineMinerData]:
+        """
+        The data of the miner if the last poll succeeded. Failed polls leave the
+        previous data in `data`, which must not be reported as current.
+        """
+        if self.last_update_success and isinstance(self.data, OnlineMinerData):
+            return self.data
+        return None
+
+    def async_add_consumer(self, command: str) -> Callable[[], None]:
+        self._consumers[command] += 1
+
+        def remove_consumer():
+            self._consumers[command] -= 1
+
+        return remove_consumer
+
+    async def _async_read(self, plan: Set[str]) -> PollResult:
+        """
+        Issues the planned reads, up to `parallelism` of them concurrently. Only the
+        summary is required, a failing optional read leaves its value empty.
+        """
+        requests: Dict[str, Callable[[], Awaitable[Any]]] = {
+            COMMAND_SUMMARY: self.api.get_summary_with_status
+        }
+        status_in_summary = self.api.adapter.status_in_summary is not None
+        if COMMAND_STATUS in plan and not status_in_summary:
+            requests[COMMAND_STATUS] = self.api.get_status
+        if COMMAND_PSU in plan:
+            requests[COMMAND_PSU] = self.api.get_psu
+        if COMMAND_VERSION in plan:
+            requests[COMMAND_VERSION] = self.api.get_version
+
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def read(command: str) -> Any:
+            try:
+                async with semaphore:
+                    async with async_timeout.timeout(10):
+                        return await requests[command]()
+            except (Exception, WhatsminerException) as error:
+                if command == COMMAND_SUMMARY:
+                    raise
+                _LOGGER.debug(
+                    "Reading %s from %s failed: %r", command, self.device_host, error
+                )
+                return None
+
+        results = dict(
+            zip(requests, await asyncio.gather(*(read(c) for c in requests)))
+        )
+        summary, status = results[COMMAND_SUMMARY]
+        if COMMAND_STATUS in results:
+            status = results[COMMAND_STATUS]
+        elif status is None and COMMAND_STATUS in plan:
+            # The firmware did not include the status in the summary after all
+            requests[COMMAND_STATUS] = self.api.get_status
+            status = await read(COMMAND_STATUS)
+        return summary, status, results.get(COMMAND_PSU), results.get(COMMAND_VERSION)
+
+    async def _async_poll(self, plan: Set[str]) -> PollResult:
+        # Only talks to the miner, so it can run on a worker loop of the engine
+        async with async_timeout.timeout(10):
+            await self.api.negotiate()
+
+        if self.device_model is None:
+            async with async_timeout.timeout(10):
+                details = await self.api.get_device_details()
+                self.device_model = details[0].model
+        return await self._async_read(plan)
 
     async def async_fetch(self) -> MinerData:
+        async with self._poll_lock:
+            return await self._async_fetch()
+
+    async def _async_fetch(self) -> MinerData:
         try:
-            await self.api.get_status()
+            plan = self.plan
+            summary, status, psu, version = await self.async_run(
+                lambda: self._async_poll(plan)
+            )
 
-            if self.device_model is None:
-                async with async_timeout.timeout(10):
-                    details = await self.api.get_device_details()
-                    self.device_model = details[0].model
-            async with async_timeout.timeout(10):
-                summary = await self.api.get_summary()
-            async with async_timeout.timeout(10):
-                psu = await self.api.get_psu()
-            async with async_timeout.timeout(10):
-                version = await self.api.get_version()
+            now = time.monotonic()
+            derived = self.window.add(now, summary)
+            energy = self.energy.add(now, summary.power)
+            self.history.append(now, summary)
+            if self.protection is not None:
+                # Sends control commands, so it runs where the machine lives
+                await self.async_run(
+                    lambda: self.protection.evaluate(summary, status)
+                )
+                self.levels.set(self.device_mac, self.protection.level)
+                if not self.protection.enabled and not self.protection.level:
+                    self.protection = None
 
-            return OnlineMinerData(
-                self.device_model, summary=summary, power_unit=psu, version=version
+            self.last_good = OnlineMinerData(
+                self.device_model,
+                summary=summary,
+                status=status,
+                power_unit=psu,
+                version=version,
+                derived=derived,
+                energy=energy,
+                updated=time.time(),
             )
+            self._last_good_time = now
+            return self.last_good
         except (TokenError, DecodeError) as error:
             raise ConfigEntryAuthFailed from error
         except MinerOffline:
+            self.window.interrupt()
+            self.energy.interrupt()
+            self.last_good = None
             return MinerData(self.device_model)
         except WhatsminerException as error:
-            raise UpdateFailed from error
+            return self._last_good_or_fail(error)
+        except EngineStopped as error:
+            # Home Assistant is shutting down
+            raise UpdateFailed("Polling engine stopped") from error
         except Exception as error:
             _LOGGER.warning("Unexpected error: %s", error)
-            raise UpdateFailed from error
+            return self._last_good_or_fail(error)
+
+    def _last_good_or_fail(self, error: BaseException) -> MinerData:
+        """
+        Bridges single failed polls with the last good data, so that entities do not
+        flap to unavailable and back
+        """
+        if (
+            self.last_good is not None
+            and time.monotonic() - self._last_good_time <= self.stale_tolerance
+        ):
+            _LOGGER.debug(
+                "Poll of %s failed, keeping data from %.0fs ago: %r",
+                self.device_host,
+                time.monotonic() - self._last_good_time,
+                error,
+            )
+            return self.last_good
+        raise UpdateFailed(repr(error)) from error
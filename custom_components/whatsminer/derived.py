@@ -0,0 +1,143 @@
+"""
+Metrics derived from consecutive summaries, maintained over a rolling time window
+"""
+import dataclasses
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from .api import Summary
+
+
+@dataclasses.dataclass
+class DerivedMetrics(object):
+    efficiency: Optional[float]
+    acceptance_rate: Optional[float]
+    hash_rate_deviation: Optional[float]
+
+
+def counter_delta(previous: Optional[int], current: int, restarted: bool) -> int:
+    # After a reboot or restart of btminer the counter started again from zero. It
+    # may have climbed past the previous value already, so a restart is detected
+    # from the elapsed time, a counter that went backwards is treated the same.
+    if previous is None:
+        return 0
+    if restarted or current < previous:
+        return current
+    return current - previous
+
+
+class RollingWindow(object):
+    """
+    Keeps running sums of power, hash rate and share deltas over the last `window`
+    seconds. Each sample is added and evicted exactly once, so updates are O(1)
+    amortized irrespective of the window length.
+    """
+
+    def __init__(self, window: float = 15 * 60):
+        self.window = window
+        self._samples: Deque[Tuple[float, float, float, float, int, int]] = deque()
+        self._power = 0.0
+        self._hash_rate = 0.0
+        self._target = 0.0
+        self._accepted = 0
+        self._rejected = 0
+        self._last_accepted: Optional[int] = None
+        self._last_rejected: Optional[int] = None
+        self._last_elapsed: Optional[int] = None
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, timestamp: float, summary: Summary) -> DerivedMetrics:
+        restarted = (
+            self._last_elapsed is not None and summary.elapsed < self._last_elapsed
+        )
+        accepted = counter_delta(self._last_accepted, summary.accepted, restarted)
+        rejected = counter_delta(self._last_rejected, summary.rejected, restarted)
+        self._last_accepted = summary.accepted
+        self._last_rejected = summary.rejected
+        self._last_elapsed = summary.elapsed
+
+        sample = (
+            timestamp,
+            float(summary.power),
+            float(summary.hash_rate_5s),
+            float(summary.target_hash_rate),
+            accepted,
+            rejected,
+        )
+        self._samples.append(sample)
+        self._power += sample[1]
+        self._hash_rate += sample[2]
+        self._target += sample[3]
+        self._accepted += accepted
+        self._rejected += rejected
+
+        self._evict(timestamp - self.window)
+        return self.metrics()
+
+    def _evict(self, cutoff: float):
+        while self._samples and self._samples[0][0] < cutoff:
+            _, power, hash_rate, target, accepted, rejected = self._samples.popleft()
+            self._power -= power
+            self._hash_rate -= hash_rate
+            self._target -= target
+            self._accepted -= accepted
+            self._rejected -= rejected
+
+    def interrupt(self):
+        # The shares counted while the miner was offline are unknown
+        self._last_accepted = None
+        self._last_rejected = None
+        self._last_elapsed = None
+
+    def metrics(self) -> DerivedMetrics:
+        # Hash rates are reported in GH/s, efficiency is given in J/TH
+        efficiency = None
+        if self._hash_rate > 0:
+            efficiency = round(self._power / (self._hash_rate / 1000), 2)
+
+        acceptance_rate = None
+        shares = self._accepted + self._rejected
+        if shares > 0:
+            acceptance_rate = round(100 * self._accepted / shares, 2)
+
+        hash_rate_deviation = None
+        if self._target > 0:
+            hash_rate_deviation = round(100 * (self._hash_rate / self._target - 1), 2)
+
+        return DerivedMetrics(
+            efficiency=efficiency,
+            acceptance_rate=acceptance_rate,
+            hash_rate_deviation=hash_rate_deviation,
+        )
+
+
+class EnergyAccumulator(object):
+    """
+    Integrates the power draw (W) into energy (kWh) with the trapezoidal rule.
+    Intervals longer than `max_gap` seconds, e.g. after failed polls, and the time
+    the miner was offline are not integrated, since the power draw in between is
+    unknown.
+    """
+
+    def __init__(self, max_gap: float = 60):
+        self.max_gap = max_gap
+        self.total = 0.0
+        self._last: Optional[Tuple[float, float]] = None
+
+    def add(self, timestamp: float, power: float) -> float:
+        if self._last is not None:
+            last_timestamp, last_power = self._last
+            elapsed = timestamp - last_timestamp
+            if 0 < elapsed <= self.max_gap:
+                self.total += (last_power + power) / 2 * elapsed / 3_600_000
+        self._last = (timestamp, float(power))
+        return self.total
+
+    def interrupt(self):
+        self._last = None
+
+    def restore(self, total: float):
+        # Energy counted since startup is kept on top of the restored total
+        self.total += total
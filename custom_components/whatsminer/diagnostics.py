@@ -0,0 +1,45 @@
+import dataclasses
+import time
+from typing import Any, Dict, Optional
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, COORDINATOR, CONF_PASSWORD
+from .coordinator import WhatsminerCoordinator
+
+TO_REDACT = {CONF_PASSWORD}
+
+# Windows (seconds) summarized from the sample history
+HISTORY_WINDOWS = (5 * 60, 30 * 60)
+
+
+def _wall_clock(timestamp: Optional[float]) -> Optional[float]:
+    # The history is timestamped with the monotonic clock
+    if timestamp is None:
+        return None
+    return time.time() - (time.monotonic() - timestamp)
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    coordinator: WhatsminerCoordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    data = coordinator.data
+
+    return {
+        "entry": async_redact_data(entry.data, TO_REDACT),
+        "data": dataclasses.asdict(data) if data is not None else None,
+        "retries": dict(coordinator.machine.retries),
+        "plan": sorted(coordinator.plan),
+        "history": {
+            "samples": len(coordinator.history),
+            "capacity": coordinator.history.capacity,
+            "latest": _wall_clock(coordinator.history.latest_timestamp),
+            **{
+                f"{window}s": coordinator.history.describe(window)
+                for window in HISTORY_WINDOWS
+            },
+        },
+    }
@@ -0,0 +1,132 @@
+"""
+Runs miner I/O on dedicated threads, each with its own event loop.
+
+With thousands of miners, socket handling, JSON parsing and token derivation add
+up to noticeable load on the loop which also runs the UI and automations. The
+engine moves that work to a small pool of worker loops, miners are assigned to a
+worker by host. Completed results are collected and handed back to the owning loop
+in one batch per tick instead of one wake-up per miner.
+
+A `WhatsminerMachine` is not thread-safe. Once a miner is polled through the
+engine, every command for it, control commands included, has to be run with the
+same key, so that it always executes on the same worker.
+"""
+import asyncio
+import threading
+import zlib
+from typing import Awaitable, Callable, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class EngineStopped(RuntimeError):
+    pass
+
+
+class PollingEngine(object):
+    def __init__(self, loop: asyncio.AbstractEventLoop, workers: int = 1):
+        self._loop = loop
+        self._workers = workers
+        self._worker_loops: List[asyncio.AbstractEventLoop] = []
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._completed: List[Tuple[asyncio.Future, asyncio.Future]] = []
+        self._flush_scheduled = False
+        # Results not delivered yet, only touched on the owning loop
+        self._pending: Set[asyncio.Future] = set()
+        self._stopped = False
+
+    def start(self):
+        for index in range(self._workers):
+            worker_loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=self._run_worker,
+                args=(worker_loop,),
+                name=f"whatsminer_io_{index}",
+                daemon=True,
+            )
+            self._worker_loops.append(worker_loop)
+            self._threads.append(thread)
+            thread.start()
+
+    @staticmethod
+    def _run_worker(worker_loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(worker_loop)
+        try:
+            worker_loop.run_forever()
+        finally:
+            worker_loop.close()
+
+    def stop(self):
+        """
+        Blocks until the workers finished, call from an executor in HA. Runs still
+        in progress fail with EngineStopped, as do all later ones.
+        """
+        self._stopped = True
+        for worker_loop in self._worker_loops:
+            worker_loop.call_soon_threadsafe(worker_loop.stop)
+        for thread in self._threads:
+            thread.join()
+        self._loop.call_soon_threadsafe(self._fail_pending)
+
+    def _fail_pending(self):
+        for result in list(self._pending):
+            if not result.done():
+                result.set_exception(EngineStopped())
+
+    def _worker_for(self, key: str) -> asyncio.AbstractEventLoop:
+        return self._worker_loops[zlib.crc32(key.encode()) % len(self._worker_loops)]
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs the coroutine created by `factory` on the worker owning `key`. Must be
+        awaited on the loop the engine was created for.
+        """
+        if self._stopped:
+            raise EngineStopped()
+        result: asyncio.Future = self._loop.create_future()
+        worker_loop = self._worker_for(key)
+        task: Optional[asyncio.Future] = None
+
+        def start():
+            nonlocal task
+            task = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda done: self._complete(result, done))
+
+        def cancel(future: asyncio.Future):
+            if future.cancelled() and task is not None:
+                worker_loop.call_soon_threadsafe(task.cancel)
+
+        result.add_done_callback(cancel)
+        self._pending.add(result)
+        result.add_done_callback(self._pending.discard)
+        try:
+            worker_loop.call_soon_threadsafe(start)
+        except RuntimeError as error:
+            # The worker loop was closed in the meantime
+            raise EngineStopped() from error
+        return await result
+
+    def _complete(self, result: asyncio.Future, done: asyncio.Future):
+        # Called on a worker loop
+        with self._lock:
+            self._completed.append((result, done))
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._loop.call_soon_threadsafe(self._flush)
+
+    def _flush(self):
+        with self._lock:
+            completed = self._completed
+            self._completed = []
+            self._flush_scheduled = False
+        for result, done in completed:
+            if result.done():
+                continue
+            if done.cancelled():
+                result.cancel()
+            elif done.exception() is not None:
+                result.set_exception(done.exception())
+            else:
+                result.set_result(done.result())
@@ -4,9 +4,8 @@ from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from . import WhatsminerCoordinator
 from .const import DOMAIN
-from .coordinator import OnlineMinerData
+from .coordinator import WhatsminerCoordinator, OnlineMinerData
 
 
 class WhatsminerEntity(CoordinatorEntity[WhatsminerCoordinator]):
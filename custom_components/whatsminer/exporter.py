@@ -0,0 +1,130 @@
+"""
+Prometheus text exposition of the miner summaries.
+
+Samples are formatted when a miner reports new data and the complete exposition is
+only joined again on the first scrape after a change, so scrapes never cause miner
+I/O and are cheap irrespective of the fleet size.
+"""
+import asyncio
+import dataclasses
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .api import Summary
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PREFIX = "whatsminer"
+COUNTERS = {"accepted", "rejected"}
+# Not exported as a value: the MAC address is a label, the power mode an info metric
+NON_NUMERIC = {"mac", "power_mode"}
+
+
+def _families() -> List[Tuple[str, str, str]]:
+    families = [("up", f"{PREFIX}_up", "gauge")]
+    for field in dataclasses.fields(Summary):
+        if field.name in NON_NUMERIC:
+            continue
+        if field.name in COUNTERS:
+            families.append((field.name, f"{PREFIX}_{field.name}_total", "counter"))
+        else:
+            families.append((field.name, f"{PREFIX}_{field.name}", "gauge"))
+    families.append(("power_mode", f"{PREFIX}_power_mode_info", "gauge"))
+    return families
+
+
+FAMILIES = _families()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+def render_samples(
+    labels: Mapping[str, str], summary: Optional[Mapping[str, Any]]
+) -> Tuple[Optional[str], ...]:
+    """
+    Formats one sample line per metric family, None where the miner has no value.
+    """
+    label_str = _format_labels(labels)
+    samples = []
+    for field, metric, _ in FAMILIES:
+        if field == "up":
+            value = 0 if summary is None else 1
+        elif summary is None or summary.get(field) is None:
+            samples.append(None)
+            continue
+        elif field == "power_mode":
+            mode_labels = _format_labels({"power_mode": summary[field]})
+            samples.append(f"{metric}{{{label_str},{mode_labels}}} 1\n")
+            continue
+        else:
+            value = summary[field]
+            if isinstance(value, bool):
+                value = int(value)
+        samples.append(f"{metric}{{{label_str}}} {value}\n")
+    return tuple(samples)
+
+
+class MetricsCache(object):
+    def __init__(self):
+        self._miners: Dict[str, Tuple[Optional[str], ...]] = {}
+        self._buffer: Optional[bytes] = None
+
+    def update(
+        self,
+        key: str,
+        labels: Mapping[str, str],
+        summary: Optional[Mapping[str, Any]],
+    ):
+        self._miners[key] = render_samples(labels, summary)
+        self._buffer = None
+
+    def remove(self, key: str):
+        if self._miners.pop(key, None) is not None:
+            self._buffer = None
+
+    def render(self) -> bytes:
+        if self._buffer is None:
+            parts = []
+            miners = list(self._miners.values())
+            for index, (_, metric, kind) in enumerate(FAMILIES):
+                parts.append(f"# TYPE {metric} {kind}\n")
+                parts.extend(
+                    samples[index] for samples in miners if samples[index] is not None
+                )
+            self._buffer = "".join(parts).encode("utf-8")
+        return self._buffer
+
+
+async def serve(cache: MetricsCache, host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Minimal HTTP endpoint for use outside of Home Assistant.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if request.split(b" ")[:2] == [b"GET", b"/metrics"]:
+                body = cache.render()
+                header = f"HTTP/1.1 200 OK\r\nContent-Type: {CONTENT_TYPE}\r\n"
+            else:
+                body = b"Not found\n"
+                header = "HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n"
+            header += f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            writer.write(header.encode("ascii") + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            logger.debug("Metrics request failed: %s", error)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
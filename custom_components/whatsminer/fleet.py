@@ -0,0 +1,100 @@
+"""
+Totals over all configured miners, maintained incrementally as miners report
+"""
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .api import Summary
+
+# (online, hash rate, power, maximum chip temperature)
+_Contribution = Tuple[bool, float, float, Optional[float]]
+_OFFLINE: _Contribution = (False, 0.0, 0.0, None)
+
+
+class FleetAggregator(object):
+    """
+    Each update only subtracts the previous contribution of the reporting miner
+    and adds the new one. The hottest chip is tracked with a max-heap whose
+    outdated entries are discarded lazily.
+    """
+
+    def __init__(self):
+        self._miners: Dict[str, _Contribution] = {}
+        self._temperatures: List[Tuple[float, str]] = []
+        self._listeners: List[Callable[[], None]] = []
+        self.total_hash_rate = 0.0
+        self.total_power = 0.0
+        self.online_count = 0
+        # Config entry which provides the fleet entities
+        self.owner: Optional[str] = None
+        # Per loaded config entry, attaches the fleet entities to that entry
+        self.adopters: Dict[str, Callable[[], None]] = {}
+
+    @property
+    def miner_count(self) -> int:
+        return len(self._miners)
+
+    @property
+    def mean_hash_rate(self) -> Optional[float]:
+        if not self.online_count:
+            return None
+        return round(self.total_hash_rate / self.online_count, 2)
+
+    @property
+    def max_chip_temperature(self) -> Optional[float]:
+        heap = self._temperatures
+        while heap:
+            temperature, key = heap[0]
+            current = self._miners.get(key, _OFFLINE)[3]
+            if current is not None and current == -temperature:
+                return current
+            heapq.heappop(heap)
+        return None
+
+    def update(self, key: str, summary: Optional[Summary]):
+        if summary is None:
+            contribution = _OFFLINE
+        else:
+            contribution = (
+                True,
+                float(summary.hash_rate_5s),
+                float(summary.power),
+                summary.chip_temperature_maximum,
+            )
+        previous = self._miners.get(key, _OFFLINE)
+        self._apply(previous, contribution)
+        self._miners[key] = contribution
+        # An unchanged temperature is still represented by its heap entry
+        if contribution[3] is not None and contribution[3] != previous[3]:
+            self._push_temperature(key, contribution[3])
+        self._notify()
+
+    def remove(self, key: str):
+        previous = self._miners.pop(key, None)
+        if previous is not None:
+            self._apply(previous, _OFFLINE)
+            self._notify()
+
+    def _apply(self, previous: _Contribution, current: _Contribution):
+        self.online_count += int(current[0]) - int(previous[0])
+        self.total_hash_rate += current[1] - previous[1]
+        self.total_power += current[2] - previous[2]
+
+    def _push_temperature(self, key: str, temperature: float):
+        heapq.heappush(self._temperatures, (-temperature, key))
+        if len(self._temperatures) > 4 * len(self._miners) + 16:
+            # Too many outdated entries accumulated, rebuild from the current values
+            self._temperatures = [
+                (-contribution[3], miner)
+                for miner, contribution in self._miners.items()
+                if contribution[3] is not None
+            ]
+            heapq.heapify(self._temperatures)
+
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            listener()
@@ -0,0 +1,144 @@
+"""
+Fixed-size history of recent summaries, stored column-wise in preallocated arrays
+"""
+import bisect
+import math
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from .api import Summary
+
+COLUMNS = (
+    "hash_rate",
+    "power",
+    "chip_temperature_maximum",
+    "chip_temperature_average",
+    "environment_temperature",
+    "fan_speed_in",
+    "fan_speed_out",
+)
+
+
+def _summary_values(summary: Summary) -> Sequence[float]:
+    # Values the firmware did not report are stored as NaN and skipped by queries
+    values = (
+        summary.hash_rate_5s,
+        summary.power,
+        summary.chip_temperature_maximum,
+        summary.chip_temperature_average,
+        summary.environment_temperature,
+        summary.fan_speed_in,
+        summary.fan_speed_out,
+    )
+    return tuple(math.nan if value is None else float(value) for value in values)
+
+
+class _Timestamps(object):
+    # Sequence view of the timestamps from oldest to newest, for bisect
+    def __init__(self, history: "SampleHistory"):
+        self._history = history
+
+    def __len__(self):
+        return len(self._history)
+
+    def __getitem__(self, position: int) -> float:
+        return self._history._timestamps[self._history._index(position)]
+
+
+class SampleHistory(object):
+    """
+    Ring buffer over the last `capacity` samples, timestamps have to increase
+    monotonically (use `time.monotonic()`). Memory usage is fixed at
+    8 * (len(COLUMNS) + 1) * capacity bytes, queries over a time window only touch
+    the samples inside it.
+    """
+
+    def __init__(self, capacity: int = 720):
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._columns: Dict[str, array] = {
+            column: array("d", bytes(8 * capacity)) for column in COLUMNS
+        }
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _index(self, position: int) -> int:
+        # Position 0 is the oldest sample
+        return (self._next - self._size + position) % self.capacity
+
+    def append(self, timestamp: float, summary: Summary):
+        self._timestamps[self._next] = timestamp
+        for column, value in zip(COLUMNS, _summary_values(summary)):
+            self._columns[column][self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    @property
+    def latest_timestamp(self) -> Optional[float]:
+        if not self._size:
+            return None
+        return self._timestamps[self._index(self._size - 1)]
+
+    def _window(self, window: Optional[float]) -> range:
+        if window is None or not self._size:
+            return range(self._size)
+        start = bisect.bisect_left(_Timestamps(self), self.latest_timestamp - window)
+        return range(start, self._size)
+
+    def timestamps(self, window: Optional[float] = None) -> List[float]:
+        return [self._timestamps[self._index(p)] for p in self._window(window)]
+
+    def values(self, column: str, window: Optional[float] = None) -> List[float]:
+        data = self._columns[column]
+        values = (data[self._index(p)] for p in self._window(window))
+        return [value for value in values if not math.isnan(value)]
+
+    def minimum(self, column: str, window: Optional[float] = None) -> Optional[float]:
+        return min(self.values(column, window), default=None)
+
+    def maximum(self, column: str, window: Optional[float] = None) -> Optional[float]:
+        return max(self.values(column, window), default=None)
+
+    def mean(self, column: str, window: Optional[float] = None) -> Optional[float]:
+        values = self.values(column, window)
+        if not values:
+            return None
+        return sum(values) / len(values)
+
+    def slope(self, column: str, window: Optional[float] = None) -> Optional[float]:
+        """
+        Least-squares trend of the column in units per second
+        """
+        data = self._columns[column]
+        samples = [
+            (self._timestamps[self._index(p)], data[self._index(p)])
+            for p in self._window(window)
+        ]
+        samples = [(t, v) for t, v in samples if not math.isnan(v)]
+        if len(samples) < 2:
+            return None
+        times = [t for t, _ in samples]
+        values = [v for _, v in samples]
+        mean_time = sum(times) / len(times)
+        mean_value = sum(values) / len(values)
+        variance = sum((t - mean_time) ** 2 for t in times)
+        if variance == 0:
+            return None
+        covariance = sum(
+            (t - mean_time) * (v - mean_value) for t, v in zip(times, values)
+        )
+        return covariance / variance
+
+    def describe(self, window: Optional[float] = None) -> Dict[str, Dict]:
+        return {
+            column: {
+                "min": self.minimum(column, window),
+                "max": self.maximum(column, window),
+                "mean": self.mean(column, window),
+                "slope": self.slope(column, window),
+            }
+            for column in COLUMNS
+        }
@@ -0,0 +1,167 @@
+"""
+Automatic throttling of miners which overheat or lose cooling
+"""
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import List, Optional
+
+from .api import MinerStatus, Summary, WhatsminerApi, WhatsminerException
+from .history import SampleHistory
+
+logger = logging.getLogger(__name__)
+
+# Power percentages applied per protection level, the last level powers off
+LEVELS = (100, 75, 50, 0)
+ACTION_TIMEOUT = 10
+
+THERMAL_RUNAWAY = "thermal_runaway"
+CHIP_OVERHEAT = "chip_overheat"
+AMBIENT_OVERHEAT = "ambient_overheat"
+FAN_STALL = "fan_stall"
+FAN_ASYMMETRY = "fan_asymmetry"
+
+
+@dataclasses.dataclass
+class ProtectionSettings(object):
+    max_chip_temperature: float = 90
+    max_environment_temperature: float = 40
+    # Rising faster than this (°C per second) close to the limit counts as runaway
+    max_temperature_slope: float = 0.05
+    runaway_margin: float = 10
+    slope_window: float = 120
+    # Disable for miners without fans, e.g. hydro or immersion cooled units
+    detect_fan_stall: bool = True
+    min_fan_speed: int = 500
+    # Consecutive samples a fan has to be stalled, so a single bad reading is ignored
+    fan_stall_samples: int = 3
+    max_fan_asymmetry: float = 0.5
+    cooldown: float = 300
+    # A stalled fan lowers the power limit faster
+    fan_stall_cooldown: float = 30
+
+
+class ProtectionEngine(object):
+    """
+    Evaluated on every poll. While a condition persists, the power limit is lowered
+    by one level per cooldown period, down to powering the miner off. A stalled fan
+    uses the shorter stall cooldown. Once all conditions cleared, the limit is
+    raised again one level per cooldown period. A miner which was powered off is
+    never powered on again. Failed attempts wait for the cooldown as well.
+
+    A disabled engine only raises a limit it set earlier (`level`, restored after a
+    restart or after protection was turned off) back to 100% at once.
+    """
+
+    def __init__(
+        self,
+        api: WhatsminerApi,
+        history: SampleHistory,
+        settings: ProtectionSettings,
+        level: int = 0,
+        enabled: bool = True,
+    ):
+        self.api = api
+        self.history = history
+        self.settings = settings
+        self.level = level
+        self.enabled = enabled
+        self.conditions: List[str] = []
+        # A restored level is kept for one cooldown period, like a fresh action
+        self._last_action: Optional[float] = (
+            time.monotonic() if level and enabled else None
+        )
+        self._stalled_samples = 0
+
+    def assess(self, summary: Summary) -> List[str]:
+        settings = self.settings
+        conditions = []
+
+        chip = summary.chip_temperature_maximum
+        if chip >= settings.max_chip_temperature:
+            conditions.append(CHIP_OVERHEAT)
+        elif chip >= settings.max_chip_temperature - settings.runaway_margin:
+            slope = self.history.slope(
+                "chip_temperature_maximum", settings.slope_window
+            )
+            if slope is not None and slope > settings.max_temperature_slope:
+                conditions.append(THERMAL_RUNAWAY)
+
+        ambient = summary.environment_temperature
+        if ambient is not None and ambient >= settings.max_environment_temperature:
+            conditions.append(AMBIENT_OVERHEAT)
+
+        fans = (summary.fan_speed_in, summary.fan_speed_out)
+        stalled = (
+            settings.detect_fan_stall
+            and summary.power > 0
+            and min(fans) < settings.min_fan_speed
+        )
+        self._stalled_samples = self._stalled_samples + 1 if stalled else 0
+        if stalled:
+            if self._stalled_samples >= settings.fan_stall_samples:
+                conditions.append(FAN_STALL)
+        elif max(fans) > 0 and (max(fans) - min(fans)) / max(fans) > (
+            settings.max_fan_asymmetry
+        ):
+            conditions.append(FAN_ASYMMETRY)
+
+        return conditions
+
+    async def evaluate(self, summary: Summary, status: Optional[MinerStatus]):
+        """
+        `status` tells whether a miner powered off by the protection is running
+        again, nothing is done while that is unknown
+        """
+        now = time.monotonic()
+        if self.level == len(LEVELS) - 1:
+            if status is None or not status.miner_online:
+                return
+            # The miner has been powered on manually
+            self.level -= 1
+            self._last_action = now
+
+        self.conditions = self.assess(summary) if self.enabled else []
+        if FAN_STALL in self.conditions:
+            cooldown = self.settings.fan_stall_cooldown
+        else:
+            cooldown = self.settings.cooldown
+        cooled_down = self._last_action is None or now - self._last_action >= cooldown
+        if self.conditions and cooled_down:
+            target = min(self.level + 1, len(LEVELS) - 1)
+        elif not self.conditions and cooled_down:
+            target = max(self.level - 1, 0) if self.enabled else 0
+        else:
+            target = self.level
+        if target == self.level:
+            return
+
+        # Failed attempts are repeated after the cooldown, not on every poll
+        self._last_action = now
+        logger.warning(
+            "Miner %s: %s, changing power limit from %s%% to %s%%",
+            self.api.machine.host,
+            ", ".join(self.conditions)
+            or ("conditions cleared" if self.enabled else "protection disabled"),
+            LEVELS[self.level],
+            LEVELS[target],
+        )
+        try:
+            if LEVELS[target] == 0:
+                await asyncio.wait_for(self.api.power_off_miner(), ACTION_TIMEOUT)
+            else:
+                await asyncio.wait_for(
+                    self.api.set_power_percent(LEVELS[target]), ACTION_TIMEOUT
+                )
+        except (
+            WhatsminerException,
+            OSError,
+            ValueError,
+            asyncio.TimeoutError,
+        ) as error:
+            logger.error(
+                "Miner %s: failed to apply protection: %s", self.api.machine.host, error
+            )
+            return
+        self.level = target
@@ -0,0 +1,188 @@
+"""
+Differences between the API generations of the miner firmware.
+
+An adapter is picked once per miner from the `api_ver` reported by `get_version`.
+It maps the logical commands used by `WhatsminerApi` to the commands of that API
+generation and describes how to read the responses.
+"""
+import dataclasses
+import re
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+REQUIRED = object()
+
+
+def _hash_rate(value) -> float:
+    # MHS -> GHS
+    return round(value / 1000)
+
+
+def _target_hash_rate(value) -> float:
+    return value / 1000
+
+
+def _security_mode(value) -> bool:
+    return value == 0
+
+
+def _firmware_version(value) -> str:
+    return str(value).strip("'")
+
+
+def _identity(value):
+    return value
+
+
+# Dataclass field -> (response key, conversion, default if the key is missing)
+ResponseTable = Mapping[str, Tuple[str, Callable[[Any], Any], Any]]
+
+SUMMARY_V1_4: ResponseTable = {
+    "elapsed": ("Elapsed", _identity, REQUIRED),
+    "average_hash_rate": ("MHS av", _hash_rate, REQUIRED),
+    "hash_rate_5s": ("MHS 5s", _hash_rate, REQUIRED),
+    "hash_rate_1m": ("MHS 1m", _hash_rate, REQUIRED),
+    "hash_rate_5m": ("MHS 5m", _hash_rate, REQUIRED),
+    "hash_rate_15m": ("MHS 15m", _hash_rate, REQUIRED),
+    "accepted": ("Accepted", _identity, REQUIRED),
+    "rejected": ("Rejected", _identity, REQUIRED),
+    "temperature": ("Temperature", _identity, REQUIRED),
+    "average_frequency": ("freq_avg", _identity, REQUIRED),
+    "fan_speed_in": ("Fan Speed In", _identity, REQUIRED),
+    "fan_speed_out": ("Fan Speed Out", _identity, REQUIRED),
+    "power": ("Power", _identity, REQUIRED),
+    "power_rate": ("Power_RT", _identity, REQUIRED),
+    "pool_rejected_percent": ("Pool Rejected%", _identity, REQUIRED),
+    "pool_stale_percent": ("Pool Stale%", _identity, REQUIRED),
+    "uptime": ("Uptime", _identity, REQUIRED),
+    "security_mode": ("Security Mode", _security_mode, REQUIRED),
+    "target_frequency": ("Target Freq", _identity, REQUIRED),
+    "target_hash_rate": ("Target MHS", _target_hash_rate, REQUIRED),
+    "environment_temperature": ("Env Temp", _identity, REQUIRED),
+    "power_mode": ("Power Mode", _identity, REQUIRED),
+    "chip_temperature_minimum": ("Chip Temp Min", _identity, REQUIRED),
+    "chip_temperature_maximum": ("Chip Temp Max", _identity, REQUIRED),
+    "chip_temperature_average": ("Chip Temp Avg", _identity, REQUIRED),
+    "mac": ("MAC", _identity, REQUIRED),
+}
+
+# The 2.0.x firmware dropped or renamed some of the informational keys between
+# releases, only the measurements are required
+SUMMARY_V2_0: ResponseTable = {
+    **SUMMARY_V1_4,
+    "security_mode": ("Security Mode", _security_mode, False),
+    "power_mode": ("Power Mode", _identity, None),
+    "target_frequency": ("Target Freq", _identity, None),
+    "environment_temperature": ("Env Temp", _identity, None),
+    "pool_stale_percent": ("Pool Stale%", _identity, None),
+}
+
+STATUS: ResponseTable = {
+    "miner_online": ("btmineroff", lambda x: x == "false", REQUIRED),
+    "firmware_version": ("Firmware Version", _firmware_version, REQUIRED),
+}
+
+# Newer firmware includes the miner status in the summary
+STATUS_IN_SUMMARY_V2_0: ResponseTable = {
+    "miner_online": ("Btmineroff", lambda x: x == "false", REQUIRED),
+    "firmware_version": ("Firmware Version", _firmware_version, REQUIRED),
+}
+
+COMMANDS_V1_4: Mapping[str, str] = {
+    "device_details": "devdetails",
+    "summary": "summary",
+    "status": "status",
+    "psu": "get_psu",
+    "version": "get_version",
+    "restart": "restart_btminer",
+    "power_off": "power_off",
+    "power_on": "power_on",
+    "low_power": "set_lower_power",
+    "reboot": "reboot",
+    "target_frequency": "set_target_freq",
+    "power_percent": "set_power_pct",
+    "enable_fast_boot": "enable_cgminer_fast_boot",
+    "disable_fast_boot": "disable_cgminer_fast_boot",
+}
+
+
+def parse_table(table: ResponseTable, data: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Raises KeyError if a required key is missing
+    """
+    values = {}
+    for field, (key, convert, default) in table.items():
+        if key in data:
+            values[field] = convert(data[key])
+        elif default is REQUIRED:
+            raise KeyError(key)
+        else:
+            values[field] = default
+    return values
+
+
+@dataclasses.dataclass(frozen=True)
+class ProtocolAdapter(object):
+    name: str
+    minimum_version: Tuple[int, int]
+    commands: Mapping[str, str]
+    summary: ResponseTable
+    status: ResponseTable = dataclasses.field(default_factory=lambda: STATUS)
+    status_in_summary: Optional[ResponseTable] = None
+
+    def command(self, name: str) -> str:
+        return self.commands[name]
+
+    def parse_summary(self, data: Mapping[str, Any]) -> Dict[str, Any]:
+        return parse_table(self.summary, data)
+
+    def parse_status(self, data: Mapping[str, Any]) -> Dict[str, Any]:
+        return parse_table(self.status, data)
+
+    def parse_summary_status(
+        self, data: Mapping[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        The status contained in a summary response, if this firmware provides it
+        """
+        if self.status_in_summary is None:
+            return None
+        try:
+            return parse_table(self.status_in_summary, data)
+        except KeyError:
+            return None
+
+
+V1_4 = ProtocolAdapter(
+    name="v1.4",
+    minimum_version=(1, 4),
+    commands=COMMANDS_V1_4,
+    summary=SUMMARY_V1_4,
+)
+
+V2_0 = ProtocolAdapter(
+    name="v2.0",
+    minimum_version=(2, 0),
+    commands=COMMANDS_V1_4,
+    summary=SUMMARY_V2_0,
+    status_in_summary=STATUS_IN_SUMMARY_V2_0,
+)
+
+# Newest first
+ADAPTERS: Tuple[ProtocolAdapter, ...] = (V2_0, V1_4)
+
+# Used until the version of a miner is known
+DEFAULT_ADAPTER = V1_4
+
+_VERSION = re.compile(r"v?(\d+)\.(\d+)")
+
+
+def select_adapter(api_version: str) -> Optional[ProtocolAdapter]:
+    match = _VERSION.search(api_version)
+    if match is None:
+        return None
+    major, minor = int(match.group(1)), int(match.group(2))
+    for adapter in ADAPTERS:
+        if (major, minor) >= adapter.minimum_version:
+            # Newer major versions are not compatible
+            return adapter if major == adapter.minimum_version[0] else None
+    return None
@@ -1,10 +1,13 @@
 import dataclasses
+import time
 from datetime import datetime, date
 from decimal import Decimal
-from typing import Callable, Optional, Union, Tuple
+from typing import Callable, List, Optional, Union, Tuple
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorEntity,
+    SensorExtraStoredData,
     SensorStateClass,
     SensorEntityDescription,
     SensorDeviceClass,
@@ -13,19 +16,33 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     FREQUENCY_MEGAHERTZ,
     TEMP_CELSIUS,
+    ENERGY_KILO_WATT_HOUR,
     FREQUENCY_HERTZ,
+    PERCENTAGE,
     POWER_WATT,
     TIME_SECONDS,
 )
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import EntityCategory
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo, EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.typing import StateType
 
-from . import WhatsminerCoordinator
-from .const import DOMAIN, COORDINATOR
-from .coordinator import OnlineMinerData
+from .const import DOMAIN, COORDINATOR, FLEET
+from .coordinator import (
+    WhatsminerCoordinator,
+    OnlineMinerData,
+    COMMAND_SUMMARY,
+    COMMAND_STATUS,
+    COMMAND_PSU,
+    COMMAND_VERSION,
+)
 from .entity import OnlineWhatsminerEntity
+from .fleet import FleetAggregator
+
+# Fleet sensors are written at most this often (seconds), no matter how many
+# miners report in between
+FLEET_UPDATE_DELAY = 5
 
 
 @dataclasses.dataclass
@@ -33,6 +50,18 @@ class WhatsminerSensorEntityDescription(SensorEntityDescription):
     value: Optional[Callable[
         [OnlineMinerData], Union[StateType, date, datetime, Decimal]
     ]] = None
+    # API command providing the value, only fetched while an entity needs it
+    command: str = COMMAND_SUMMARY
+    # Hands the restored state back to the coordinator
+    restore: Optional[Callable[[WhatsminerCoordinator, StateType], None]] = None
+    # Total kept by the coordinator across polls. Shown instead of `value` while
+    # the miner is online, saved on shutdown even while it is not.
+    total: Optional[Callable[[WhatsminerCoordinator], StateType]] = None
+
+
+@dataclasses.dataclass
+class FleetSensorEntityDescription(SensorEntityDescription):
+    value: Optional[Callable[[FleetAggregator], StateType]] = None
 
 
 SENSOR_TYPES: Tuple[WhatsminerSensorEntityDescription, ...] = (
@@ -182,6 +211,24 @@ SENSOR_TYPES: Tuple[WhatsminerSensorEntityDescription, ...] = (
         entity_category=EntityCategory.DIAGNOSTIC,
         value=lambda x: x.summary.power,
     ),
+    WhatsminerSensorEntityDescription(
+        key="efficiency",
+        name="Efficiency",
+        native_unit_of_measurement="J/TH",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        icon="mdi:lightning-bolt-circle",
+        value=lambda x: x.derived.efficiency,
+    ),
+    WhatsminerSensorEntityDescription(
+        key="energy",
+        name="Energy",
+        native_unit_of_measurement=ENERGY_KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        device_class=SensorDeviceClass.ENERGY,
+        restore=lambda coordinator, value: coordinator.energy.restore(float(value)),
+        total=lambda coordinator: round(coordinator.energy.total, 3),
+    ),
     WhatsminerSensorEntityDescription(
         key="power_rate",
         name="Power Rate",
@@ -233,6 +280,100 @@ SENSOR_TYPES: Tuple[WhatsminerSensorEntityDescription, ...] = (
         entity_category=EntityCategory.DIAGNOSTIC,
         value=lambda x: x.summary.pool_stale_percent,
     ),
+    WhatsminerSensorEntityDescription(
+        key="data_age",
+        name="Data Age",
+        native_unit_of_measurement=TIME_SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value=lambda x: round(time.time() - x.updated),
+    ),
+    WhatsminerSensorEntityDescription(
+        key="firmware_version",
+        name="Firmware Version",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        command=COMMAND_VERSION,
+        value=lambda x: x.version.firmware_version if x.version else None,
+    ),
+    WhatsminerSensorEntityDescription(
+        key="miner_status",
+        name="Miner Status",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        command=COMMAND_STATUS,
+        value=lambda x: None
+        if x.status is None
+        else ("running" if x.status.miner_online else "stopped"),
+    ),
+    WhatsminerSensorEntityDescription(
+        key="psu_model",
+        name="PSU Model",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        command=COMMAND_PSU,
+        value=lambda x: x.power_unit.model if x.power_unit else None,
+    ),
+    WhatsminerSensorEntityDescription(
+        key="acceptance_rate",
+        name="Acceptance Rate",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value=lambda x: x.derived.acceptance_rate,
+    ),
+    WhatsminerSensorEntityDescription(
+        key="hash_rate_deviation",
+        name="Hash Rate Deviation",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value=lambda x: x.derived.hash_rate_deviation,
+    ),
+)
+
+
+FLEET_SENSOR_TYPES: Tuple[FleetSensorEntityDescription, ...] = (
+    FleetSensorEntityDescription(
+        key="hash_rate_total",
+        name="Total Hash Rate",
+        native_unit_of_measurement=FREQUENCY_MEGAHERTZ,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.FREQUENCY,
+        value=lambda x: round(x.total_hash_rate, 2),
+    ),
+    FleetSensorEntityDescription(
+        key="hash_rate_mean",
+        name="Mean Hash Rate",
+        native_unit_of_measurement=FREQUENCY_MEGAHERTZ,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.FREQUENCY,
+        value=lambda x: x.mean_hash_rate,
+    ),
+    FleetSensorEntityDescription(
+        key="power_total",
+        name="Total Power Usage",
+        native_unit_of_measurement=POWER_WATT,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.POWER,
+        value=lambda x: round(x.total_power, 2),
+    ),
+    FleetSensorEntityDescription(
+        key="online",
+        name="Miners Online",
+        state_class=SensorStateClass.MEASUREMENT,
+        icon="mdi:server-network",
+        value=lambda x: x.online_count,
+    ),
+    FleetSensorEntityDescription(
+        key="temperature_chip_max",
+        name="Chip Temperature (maximum)",
+        native_unit_of_measurement=TEMP_CELSIUS,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.TEMPERATURE,
+        value=lambda x: x.max_chip_temperature,
+    ),
 )
 
 
@@ -241,12 +382,40 @@ async def async_setup_entry(
 ) -> None:
     coordinator: WhatsminerCoordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
 
-    async_add_entities(
-        [WhatsminerSensor(coordinator, description) for description in SENSOR_TYPES]
-    )
+    entities: List[SensorEntity] = [
+        WhatsminerSensor(coordinator, description) for description in SENSOR_TYPES
+    ]
+
+    async_add_entities(entities)
+
+    # The fleet entities are attached to one of the loaded entries. When that entry
+    # is unloaded, another one takes them over.
+    fleet: FleetAggregator = hass.data[DOMAIN][FLEET]
+
+    @callback
+    def adopt_fleet():
+        fleet.owner = entry.entry_id
+        async_add_entities(
+            [FleetSensor(fleet, description) for description in FLEET_SENSOR_TYPES]
+        )
 
+    @callback
+    def release_fleet():
+        fleet.adopters.pop(entry.entry_id, None)
+        if fleet.owner == entry.entry_id:
+            fleet.owner = None
+            # Runs after the platforms of this entry removed their entities
+            for adopt in fleet.adopters.values():
+                adopt()
+                break
 
-class WhatsminerSensor(OnlineWhatsminerEntity, SensorEntity):
+    fleet.adopters[entry.entry_id] = adopt_fleet
+    entry.async_on_unload(release_fleet)
+    if fleet.owner is None:
+        adopt_fleet()
+
+
+class WhatsminerSensor(OnlineWhatsminerEntity, RestoreSensor):
     def __init__(
         self,
         coordinator: WhatsminerCoordinator,
@@ -255,9 +424,90 @@ class WhatsminerSensor(OnlineWhatsminerEntity, SensorEntity):
         super(WhatsminerSensor, self).__init__(coordinator)
         self.entity_description: WhatsminerSensorEntityDescription = entity_description
         self._attr_unique_id = f"{coordinator.device_mac}_{entity_description.key}"
+        self._restored_value: Union[StateType, date, datetime, Decimal] = None
+
+    async def async_added_to_hass(self) -> None:
+        await super(WhatsminerSensor, self).async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_consumer(self.entity_description.command)
+        )
+        last_data = await self.async_get_last_sensor_data()
+        if last_data is not None:
+            self._restored_value = last_data.native_value
+            restore = self.entity_description.restore
+            if restore is not None and last_data.native_value is not None:
+                restore(self.coordinator, last_data.native_value)
+
+    @property
+    def extra_restore_state_data(self) -> SensorExtraStoredData:
+        total = self.entity_description.total
+        if total is None:
+            return super(WhatsminerSensor, self).extra_restore_state_data
+        return SensorExtraStoredData(
+            total(self.coordinator), self.native_unit_of_measurement
+        )
+
+    @property
+    def _first_refresh_pending(self) -> bool:
+        # A failed refresh does not set any data, but marks the update as failed
+        return self.coordinator.data is None and self.coordinator.last_update_success
+
+    @property
+    def available(self) -> bool:
+        # Until the first refresh completed, the restored state is shown
+        if self._first_refresh_pending:
+            return self._restored_value is not None
+        return super(WhatsminerSensor, self).available
 
     @property
     def native_value(self) -> Union[StateType, date, datetime, Decimal]:
+        if self._first_refresh_pending:
+            return self._restored_value
         if not isinstance(self.coordinator.data, OnlineMinerData):
             return None
+        # The snapshot in the data would miss a total restored after the poll
+        if self.entity_description.total is not None:
+            return self.entity_description.total(self.coordinator)
         return self.entity_description.value(self.coordinator.data)
+
+
+class FleetSensor(SensorEntity):
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self, fleet: FleetAggregator, entity_description: FleetSensorEntityDescription
+    ):
+        self.fleet = fleet
+        self.entity_description: FleetSensorEntityDescription = entity_description
+        self._attr_unique_id = f"fleet_{entity_description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "fleet")},
+            name="Whatsminer Fleet",
+            manufacturer="Whatsminer",
+        )
+        self._cancel_write: Optional[Callable[[], None]] = None
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self.fleet.async_add_listener(self._schedule_write))
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._cancel_write is not None:
+            self._cancel_write()
+            self._cancel_write = None
+
+    @callback
+    def _schedule_write(self) -> None:
+        if self._cancel_write is None:
+            self._cancel_write = async_call_later(
+                self.hass, FLEET_UPDATE_DELAY, self._write
+            )
+
+    @callback
+    def _write(self, _now) -> None:
+        self._cancel_write = None
+        self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> StateType:
+        return self.entity_description.value(self.fleet)
@@ -11,9 +11,8 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.entity import EntityCategory
 
-from . import WhatsminerCoordinator
 from .const import DOMAIN, COORDINATOR
-from .coordinator import OnlineMinerData
+from .coordinator import WhatsminerCoordinator, OnlineMinerData
 from .entity import WhatsminerEntity
 
 SWITCH_TYPES: Tuple[SwitchEntityDescription, ...] = (
@@ -53,7 +52,7 @@ class MinerSwitch(WhatsminerEntity, SwitchEntity):
         raise NotImplemented
 
     async def async_turn_on(self) -> None:
-        await self.coordinator.api.power_on_miner()
+        await self.coordinator.async_run(self.coordinator.api.power_on_miner)
 
     async def async_turn_off(self) -> None:
-        await self.coordinator.api.power_off_miner()
+        await self.coordinator.async_run(self.coordinator.api.power_off_miner)
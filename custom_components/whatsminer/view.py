@@ -0,0 +1,17 @@
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+
+from .exporter import CONTENT_TYPE, MetricsCache
+
+
+class WhatsminerMetricsView(HomeAssistantView):
+    url = "/api/whatsminer/metrics"
+    name = "api:whatsminer:metrics"
+
+    def __init__(self, cache: MetricsCache):
+        self.cache = cache
+
+    async def get(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.cache.render(), headers={"Content-Type": CONTENT_TYPE}
+        )
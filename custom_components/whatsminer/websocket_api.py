@@ -0,0 +1,115 @@
+"""
+Websocket commands returning the state of all miners at once, for dashboards
+which would otherwise subscribe to every single entity
+"""
+import dataclasses
+from typing import Any, Dict, List, Optional
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .api import Summary
+from .const import DOMAIN, COORDINATOR, SIGNAL_MINER_UPDATED
+from .coordinator import WhatsminerCoordinator
+
+SUMMARY_COLUMNS = tuple(field.name for field in dataclasses.fields(Summary))
+DERIVED_COLUMNS = ("efficiency", "acceptance_rate", "hash_rate_deviation")
+COLUMNS = (
+    ("mac", "host", "model", "online", "updated")
+    + SUMMARY_COLUMNS
+    + DERIVED_COLUMNS
+    + ("energy",)
+)
+
+
+def miner_row(coordinator: WhatsminerCoordinator) -> List[Any]:
+    head = [coordinator.device_mac, coordinator.device_host, coordinator.device_model]
+    data = coordinator.online_data
+    if data is None:
+        return head + [False] + [None] * (len(COLUMNS) - len(head) - 1)
+    return (
+        head
+        + [True, data.updated]
+        + [getattr(data.summary, column) for column in SUMMARY_COLUMNS]
+        + [getattr(data.derived, column) for column in DERIVED_COLUMNS]
+        + [round(coordinator.energy.total, 3)]
+    )
+
+
+def _coordinators(hass: HomeAssistant) -> List[WhatsminerCoordinator]:
+    coordinators = []
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+        if entry_data is not None:
+            coordinators.append(entry_data[COORDINATOR])
+    return coordinators
+
+
+def _columnar(rows: List[List[Any]]) -> Dict[str, Any]:
+    # One list per column, even without any miners
+    values = [[row[index] for row in rows] for index in range(len(COLUMNS))]
+    return {"columns": COLUMNS, "values": values}
+
+
+@callback
+def async_register_websocket_commands(hass: HomeAssistant):
+    websocket_api.async_register_command(hass, websocket_snapshot)
+    websocket_api.async_register_command(hass, websocket_subscribe)
+
+
+@websocket_api.websocket_command({vol.Required("type"): "whatsminer/fleet/snapshot"})
+@callback
+def websocket_snapshot(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+):
+    rows = [miner_row(coordinator) for coordinator in _coordinators(hass)]
+    connection.send_result(msg["id"], _columnar(rows))
+
+
+@websocket_api.websocket_command({vol.Required("type"): "whatsminer/fleet/subscribe"})
+@callback
+def websocket_subscribe(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+):
+    """
+    Sends a snapshot first, afterwards only the columns of a miner which changed
+    since the last message, or that the miner was removed
+    """
+    sent: Dict[str, List[Any]] = {}
+    for coordinator in _coordinators(hass):
+        sent[coordinator.device_mac] = miner_row(coordinator)
+
+    @callback
+    def forward(mac: str, coordinator: Optional[WhatsminerCoordinator]):
+        if coordinator is None:
+            if sent.pop(mac, None) is not None:
+                connection.send_message(
+                    websocket_api.event_message(
+                        msg["id"], {"mac": mac, "removed": True}
+                    )
+                )
+            return
+        row = miner_row(coordinator)
+        previous = sent.get(mac)
+        changes = {
+            column: value
+            for index, (column, value) in enumerate(zip(COLUMNS, row))
+            if previous is None or previous[index] != value
+        }
+        sent[mac] = row
+        if changes:
+            connection.send_message(
+                websocket_api.event_message(msg["id"], {"mac": mac, "changes": changes})
+            )
+
+    connection.subscriptions[msg["id"]] = async_dispatcher_connect(
+        hass, SIGNAL_MINER_UPDATED, forward
+    )
+    connection.send_result(msg["id"])
+    connection.send_message(
+        websocket_api.event_message(
+            msg["id"], {"snapshot": _columnar(list(sent.values()))}
+        )
+    )
@@ -0,0 +1,34 @@
+from custom_components.whatsminer.api import Summary
+
+SUMMARY_VALUES = dict(
+    elapsed=1000,
+    average_hash_rate=68000,
+    hash_rate_5s=67000,
+    hash_rate_1m=68000,
+    hash_rate_5m=68000,
+    hash_rate_15m=68000,
+    average_frequency=600,
+    target_frequency=600,
+    target_hash_rate=68000,
+    accepted=1000,
+    rejected=2,
+    temperature=70.0,
+    chip_temperature_minimum=60.0,
+    chip_temperature_maximum=80.0,
+    chip_temperature_average=70.0,
+    environment_temperature=25.0,
+    fan_speed_in=4000,
+    fan_speed_out=4100,
+    power=3300,
+    power_rate=3300,
+    power_mode="Normal",
+    pool_rejected_percent=0.1,
+    pool_stale_percent=0.0,
+    uptime=10000,
+    security_mode=True,
+    mac="C4:11:22:33:44:55",
+)
+
+
+def make_summary(**values) -> Summary:
+    return Summary(**{**SUMMARY_VALUES, **values})
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+
+from custom_components.whatsminer.api import (
+    EmptyResponse,
+    InvalidResponse,
+    RetryPolicy,
+    WhatsminerMachine,
+)
+
+OK = json.dumps({"STATUS": "S", "Msg": {}})
+
+
+class FlakyMachine(WhatsminerMachine):
+    """
+    Fails the first exchanges with the given errors, then answers
+    """
+
+    def __init__(self, *errors: BaseException, attempts: int = 3):
+        super(FlakyMachine, self).__init__(
+            "miner", retry_policy=RetryPolicy(attempts=attempts, base_delay=0)
+        )
+        self.errors = list(errors)
+        self.exchanges = 0
+
+    async def _get_token(self) -> str:
+        return "token"
+
+    async def _exchange(self, data, encrypted, expect_response):
+        self.exchanges += 1
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is None:
+                return ""
+            raise error
+        return OK
+
+
+def communicate(machine: WhatsminerMachine, cmd: str, encrypted: bool = False):
+    return asyncio.run(machine.communicate(cmd, encrypted=encrypted))
+
+
+def test_transient_errors_are_retried():
+    machine = FlakyMachine(ConnectionResetError(), BrokenPipeError())
+    assert communicate(machine, "summary")["STATUS"] == "S"
+    assert machine.exchanges == 3
+    assert machine.retries == {"summary": 2}
+
+
+def test_empty_response_is_retried():
+    machine = FlakyMachine(None)
+    communicate(machine, "get_version")
+    assert machine.retries == {"get_version": 1}
+
+
+def test_gives_up_after_the_last_attempt():
+    machine = FlakyMachine(*[ConnectionResetError()] * 3)
+    with pytest.raises(ConnectionResetError):
+        communicate(machine, "summary")
+    assert machine.exchanges == 3
+    assert machine.retries == {"summary": 2}
+
+    machine = FlakyMachine(None, attempts=1)
+    with pytest.raises(EmptyResponse):
+        communicate(machine, "summary")
+
+
+def test_encrypted_commands_are_never_retried():
+    machine = FlakyMachine(ConnectionResetError())
+    with pytest.raises(ConnectionResetError):
+        communicate(machine, "summary", encrypted=True)
+    assert machine.exchanges == 1
+    assert not machine.retries
+
+
+def test_control_commands_are_never_retried():
+    machine = FlakyMachine(ConnectionResetError())
+    with pytest.raises(ConnectionResetError):
+        communicate(machine, "power_off")
+    assert machine.exchanges == 1
+    assert not machine.retries
+
+
+def test_other_errors_are_not_retried():
+    machine = FlakyMachine(ConnectionRefusedError())
+    with pytest.raises(ConnectionRefusedError):
+        communicate(machine, "summary")
+    assert machine.exchanges == 1
+
+    machine = FlakyMachine(InvalidResponse())
+    with pytest.raises(InvalidResponse):
+        communicate(machine, "summary")
+    assert machine.exchanges == 1
+
+
+def test_retry_delay_is_bounded():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5)
+    for retry in range(1, 10):
+        assert 0 <= policy.delay(retry) <= 0.5
@@ -0,0 +1,88 @@
+import math
+
+from custom_components.whatsminer.derived import (
+    EnergyAccumulator,
+    RollingWindow,
+    counter_delta,
+)
+
+from .common import make_summary
+
+
+def test_counter_delta():
+    assert counter_delta(None, 100, False) == 0
+    assert counter_delta(100, 150, False) == 50
+    # Went backwards, counted up from zero since
+    assert counter_delta(100, 30, False) == 30
+    # Restarted and already past the previous value
+    assert counter_delta(100, 150, True) == 150
+
+
+def test_rolling_window_metrics():
+    window = RollingWindow()
+    window.add(0, make_summary(accepted=1000, rejected=0))
+    metrics = window.add(
+        5, make_summary(accepted=1099, rejected=1, hash_rate_5s=66000, power=3300)
+    )
+    assert metrics.acceptance_rate == 99.0
+    # 3300 W at 66.5 TH/s on average
+    assert metrics.efficiency == round(3300 / 66.5, 2)
+    assert metrics.hash_rate_deviation == round(100 * (66500 / 68000 - 1), 2)
+
+
+def test_rolling_window_evicts_old_samples():
+    window = RollingWindow(window=60)
+    window.add(0, make_summary(accepted=0, rejected=0))
+    window.add(10, make_summary(accepted=0, rejected=10))
+    metrics = window.add(100, make_summary(accepted=10, rejected=10))
+    assert len(window) == 1
+    assert metrics.acceptance_rate == 100.0
+
+
+def test_rolling_window_counter_reset():
+    window = RollingWindow()
+    window.add(0, make_summary(elapsed=1000, accepted=1000, rejected=0))
+    metrics = window.add(5, make_summary(elapsed=5, accepted=10, rejected=10))
+    assert metrics.acceptance_rate == 50.0
+
+
+def test_rolling_window_restart_detected_from_elapsed():
+    window = RollingWindow()
+    window.add(0, make_summary(elapsed=1000, accepted=100, rejected=0))
+    # The counter climbed past the previous value since the restart
+    metrics = window.add(5, make_summary(elapsed=50, accepted=150, rejected=150))
+    assert metrics.acceptance_rate == 50.0
+
+
+def test_rolling_window_interrupt():
+    window = RollingWindow()
+    window.add(0, make_summary(accepted=100, rejected=0))
+    window.interrupt()
+    metrics = window.add(5, make_summary(accepted=5000, rejected=5000))
+    # The shares in between are unknown and not counted
+    assert metrics.acceptance_rate is None
+
+
+def test_energy_accumulator_integrates_power():
+    energy = EnergyAccumulator()
+    assert energy.add(0, 3600) == 0
+    assert math.isclose(energy.add(10, 3600), 0.01)
+    # Trapezoidal: average of both samples
+    assert math.isclose(energy.add(20, 0), 0.015)
+
+
+def test_energy_accumulator_skips_gaps():
+    energy = EnergyAccumulator(max_gap=60)
+    energy.add(0, 3600)
+    assert energy.add(120, 3600) == 0
+    energy.interrupt()
+    assert energy.add(125, 3600) == 0
+    assert math.isclose(energy.add(135, 3600), 0.01)
+
+
+def test_energy_accumulator_restore():
+    energy = EnergyAccumulator()
+    energy.add(0, 3600)
+    energy.add(10, 3600)
+    energy.restore(5.0)
+    assert math.isclose(energy.total, 5.01)
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from custom_components.whatsminer.engine import EngineStopped, PollingEngine
+
+
+async def _answer(value):
+    await asyncio.sleep(0)
+    return value
+
+
+def test_run_returns_the_result_of_the_worker():
+    async def scenario():
+        engine = PollingEngine(asyncio.get_running_loop(), workers=2)
+        engine.start()
+        try:
+            assert await engine.run("a", lambda: _answer(1)) == 1
+            assert await engine.run("b", lambda: _answer(2)) == 2
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, engine.stop)
+
+    asyncio.run(scenario())
+
+
+def test_run_after_stop_raises():
+    async def scenario():
+        engine = PollingEngine(asyncio.get_running_loop())
+        engine.start()
+        await asyncio.get_running_loop().run_in_executor(None, engine.stop)
+        with pytest.raises(EngineStopped):
+            await engine.run("a", lambda: _answer(1))
+
+    asyncio.run(scenario())
+
+
+def test_stop_fails_runs_in_progress():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        engine = PollingEngine(loop)
+        engine.start()
+        run = asyncio.ensure_future(engine.run("a", lambda: asyncio.sleep(60)))
+        await asyncio.sleep(0.05)
+        await loop.run_in_executor(None, engine.stop)
+        with pytest.raises(EngineStopped):
+            await asyncio.wait_for(run, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import dataclasses
+
+from custom_components.whatsminer.exporter import FAMILIES, MetricsCache
+
+from .common import make_summary
+
+LABELS = {"mac": "c4:11:22:33:44:55", "host": "10.0.0.2", "model": "M20S"}
+
+
+def test_families_export_numeric_fields_once():
+    metrics = [metric for _, metric, _ in FAMILIES]
+    assert len(metrics) == len(set(metrics))
+    assert "whatsminer_mac" not in metrics
+    assert "whatsminer_power_mode" not in metrics
+    assert "whatsminer_power_mode_info" in metrics
+    assert "whatsminer_accepted_total" in metrics
+
+
+def test_render():
+    cache = MetricsCache()
+    summary = dataclasses.asdict(make_summary(environment_temperature=None))
+    cache.update("a", LABELS, summary)
+    text = cache.render().decode()
+    assert 'whatsminer_up{mac="c4:11:22:33:44:55",host="10.0.0.2",model="M20S"} 1\n' in text
+    assert "whatsminer_power_mode_info{" in text and 'power_mode="Normal"} 1' in text
+    assert "whatsminer_environment_temperature{" not in text
+    assert "# TYPE whatsminer_environment_temperature gauge" in text
+
+
+def test_offline_miner_only_reports_up():
+    cache = MetricsCache()
+    cache.update("a", LABELS, None)
+    samples = [
+        line for line in cache.render().decode().splitlines() if not line.startswith("#")
+    ]
+    assert samples == [
+        'whatsminer_up{mac="c4:11:22:33:44:55",host="10.0.0.2",model="M20S"} 0'
+    ]
@@ -0,0 +1,61 @@
+from custom_components.whatsminer.fleet import FleetAggregator
+
+from .common import make_summary
+
+
+def test_totals_follow_updates():
+    fleet = FleetAggregator()
+    fleet.update("a", make_summary(hash_rate_5s=100, power=1000))
+    fleet.update("b", make_summary(hash_rate_5s=200, power=2000))
+    fleet.update("a", make_summary(hash_rate_5s=150, power=1500))
+    assert fleet.online_count == 2
+    assert fleet.total_hash_rate == 350
+    assert fleet.total_power == 3500
+    assert fleet.mean_hash_rate == 175
+
+
+def test_offline_and_removed_miners_do_not_count():
+    fleet = FleetAggregator()
+    fleet.update("a", make_summary(hash_rate_5s=100, power=1000))
+    fleet.update("b", make_summary(hash_rate_5s=200, power=2000))
+    fleet.update("a", None)
+    assert fleet.online_count == 1
+    assert fleet.total_hash_rate == 200
+    assert fleet.miner_count == 2
+    fleet.remove("b")
+    assert fleet.online_count == 0
+    assert fleet.total_power == 0
+    assert fleet.mean_hash_rate is None
+    assert fleet.miner_count == 1
+
+
+def test_max_chip_temperature_discards_outdated_entries():
+    fleet = FleetAggregator()
+    fleet.update("a", make_summary(chip_temperature_maximum=90))
+    fleet.update("b", make_summary(chip_temperature_maximum=80))
+    assert fleet.max_chip_temperature == 90
+    fleet.update("a", make_summary(chip_temperature_maximum=70))
+    assert fleet.max_chip_temperature == 80
+    fleet.update("b", None)
+    assert fleet.max_chip_temperature == 70
+    fleet.remove("a")
+    assert fleet.max_chip_temperature is None
+
+
+def test_heap_is_rebuilt_when_outdated_entries_pile_up():
+    fleet = FleetAggregator()
+    for temperature in range(1000):
+        fleet.update("a", make_summary(chip_temperature_maximum=temperature))
+    assert len(fleet._temperatures) <= 4 * fleet.miner_count + 17
+    assert fleet.max_chip_temperature == 999
+
+
+def test_listeners():
+    fleet = FleetAggregator()
+    calls = []
+    remove = fleet.async_add_listener(lambda: calls.append(1))
+    fleet.update("a", make_summary())
+    fleet.remove("a")
+    remove()
+    fleet.update("a", make_summary())
+    assert len(calls) == 2
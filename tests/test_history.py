@@ -0,0 +1,54 @@
+import math
+
+from custom_components.whatsminer.history import COLUMNS, SampleHistory
+
+from .common import make_summary
+
+
+def test_ring_buffer_keeps_the_latest_samples():
+    history = SampleHistory(capacity=3)
+    for timestamp in range(5):
+        history.append(float(timestamp), make_summary(power=timestamp))
+    assert len(history) == 3
+    assert history.timestamps() == [2.0, 3.0, 4.0]
+    assert history.values("power") == [2.0, 3.0, 4.0]
+    assert history.latest_timestamp == 4.0
+
+
+def test_window_selects_recent_samples():
+    history = SampleHistory(capacity=4)
+    for timestamp in range(6):
+        history.append(timestamp * 10.0, make_summary(power=timestamp))
+    assert history.values("power", window=15) == [4.0, 5.0]
+    assert history.minimum("power", window=20) == 3.0
+    assert history.maximum("power") == 5.0
+    assert history.mean("power") == 3.5
+
+
+def test_slope():
+    history = SampleHistory()
+    for timestamp in range(10):
+        history.append(
+            timestamp * 5.0, make_summary(chip_temperature_maximum=60 + timestamp)
+        )
+    assert math.isclose(history.slope("chip_temperature_maximum"), 0.2)
+    assert history.slope("power") == 0
+
+
+def test_empty_history():
+    history = SampleHistory()
+    assert history.latest_timestamp is None
+    assert history.mean("power") is None
+    assert history.slope("power") is None
+    assert set(history.describe()) == set(COLUMNS)
+
+
+def test_missing_values_are_skipped():
+    history = SampleHistory()
+    history.append(0.0, make_summary(environment_temperature=None))
+    history.append(5.0, make_summary(environment_temperature=None))
+    history.append(10.0, make_summary(environment_temperature=30))
+    assert history.values("environment_temperature") == [30.0]
+    assert history.mean("environment_temperature") == 30.0
+    assert history.slope("environment_temperature") is None
+    assert history.mean("power") == 3300
@@ -0,0 +1,168 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from custom_components.whatsminer import protection
+from custom_components.whatsminer.api import CommandError, MinerStatus
+from custom_components.whatsminer.history import SampleHistory
+from custom_components.whatsminer.protection import (
+    AMBIENT_OVERHEAT,
+    CHIP_OVERHEAT,
+    FAN_ASYMMETRY,
+    FAN_STALL,
+    LEVELS,
+    ProtectionEngine,
+    ProtectionSettings,
+)
+
+from .common import make_summary
+
+RUNNING = MinerStatus(miner_online=True, firmware_version="1")
+STOPPED = MinerStatus(miner_online=False, firmware_version="1")
+OFF = len(LEVELS) - 1
+
+
+class FakeApi(object):
+    class machine(object):
+        host = "miner"
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+        self.limits: List[int] = []
+
+    async def set_power_percent(self, percent: int):
+        if self.error is not None:
+            raise self.error
+        self.limits.append(percent)
+
+    async def power_off_miner(self):
+        await self.set_power_percent(0)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_engine(
+    monkeypatch, api=None, level=0, enabled=True, **settings
+) -> Tuple[ProtectionEngine, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(protection.time, "monotonic", clock)
+    engine = ProtectionEngine(
+        api or FakeApi(),
+        SampleHistory(),
+        ProtectionSettings(**settings),
+        level=level,
+        enabled=enabled,
+    )
+    return engine, clock
+
+
+def evaluate(engine: ProtectionEngine, status=RUNNING, **values):
+    asyncio.run(engine.evaluate(make_summary(**values), status))
+
+
+def test_assess():
+    engine = ProtectionEngine(None, SampleHistory(), ProtectionSettings())
+    assert engine.assess(make_summary()) == []
+    assert engine.assess(make_summary(chip_temperature_maximum=95)) == [CHIP_OVERHEAT]
+    assert engine.assess(make_summary(environment_temperature=45)) == [
+        AMBIENT_OVERHEAT
+    ]
+    assert engine.assess(make_summary(fan_speed_in=1000)) == [FAN_ASYMMETRY]
+
+
+def test_missing_ambient_temperature_is_ignored():
+    engine = ProtectionEngine(None, SampleHistory(), ProtectionSettings())
+    assert engine.assess(make_summary(environment_temperature=None)) == []
+
+
+def test_fan_stall_needs_consecutive_samples(monkeypatch):
+    engine, _ = make_engine(monkeypatch, fan_stall_samples=3)
+    evaluate(engine, fan_speed_in=0)
+    evaluate(engine, fan_speed_in=0)
+    evaluate(engine)
+    evaluate(engine, fan_speed_in=0)
+    evaluate(engine, fan_speed_in=0)
+    assert engine.api.limits == []
+    evaluate(engine, fan_speed_in=0)
+    assert engine.conditions == [FAN_STALL]
+    assert engine.api.limits == [75]
+
+
+def test_fan_stall_detection_can_be_disabled():
+    engine = ProtectionEngine(
+        None, SampleHistory(), ProtectionSettings(detect_fan_stall=False)
+    )
+    for _ in range(5):
+        conditions = engine.assess(make_summary(fan_speed_in=0, fan_speed_out=0))
+    assert conditions == []
+
+
+def test_levels_change_once_per_cooldown(monkeypatch):
+    engine, clock = make_engine(monkeypatch, cooldown=300)
+    evaluate(engine, chip_temperature_maximum=95)
+    evaluate(engine, chip_temperature_maximum=95)
+    assert engine.api.limits == [75]
+    clock.now += 300
+    evaluate(engine, chip_temperature_maximum=95)
+    assert engine.api.limits == [75, 50]
+    clock.now += 300
+    evaluate(engine)
+    assert engine.api.limits == [75, 50, 75]
+    assert engine.level == 1
+
+
+def test_powered_off_miner_waits_for_the_status(monkeypatch):
+    engine, _ = make_engine(
+        monkeypatch, fan_stall_samples=1, fan_stall_cooldown=0
+    )
+    for _ in range(OFF):
+        evaluate(engine, fan_speed_in=0)
+    assert engine.level == OFF
+    assert engine.api.limits == [75, 50, 0]
+
+    evaluate(engine, status=None)
+    evaluate(engine, status=STOPPED)
+    assert engine.level == OFF
+    evaluate(engine, status=RUNNING)
+    assert engine.level == OFF - 1
+
+
+def test_failed_attempts_wait_for_the_cooldown(monkeypatch):
+    api = FakeApi(CommandError("set_power_pct"))
+    engine, clock = make_engine(monkeypatch, api=api, cooldown=300)
+    calls = []
+    original = api.set_power_percent
+
+    async def counting(percent):
+        calls.append(percent)
+        await original(percent)
+
+    api.set_power_percent = counting
+    evaluate(engine, chip_temperature_maximum=95)
+    evaluate(engine, chip_temperature_maximum=95)
+    assert calls == [75]
+    assert engine.level == 0
+    clock.now += 300
+    evaluate(engine, chip_temperature_maximum=95)
+    assert calls == [75, 75]
+
+
+def test_restored_level_is_kept_for_a_cooldown(monkeypatch):
+    engine, clock = make_engine(monkeypatch, level=2, cooldown=300)
+    evaluate(engine)
+    assert engine.level == 2
+    clock.now += 300
+    evaluate(engine)
+    assert engine.level == 1
+
+
+def test_disabled_engine_restores_full_power(monkeypatch):
+    engine, _ = make_engine(monkeypatch, level=2, enabled=False)
+    evaluate(engine, chip_temperature_maximum=95)
+    assert engine.api.limits == [100]
+    assert engine.level == 0
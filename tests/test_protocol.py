@@ -0,0 +1,125 @@
+import dataclasses
+
+import pytest
+
+from custom_components.whatsminer.api import MinerStatus, Summary
+from custom_components.whatsminer.protocol import (
+    REQUIRED,
+    SUMMARY_V1_4,
+    V1_4,
+    V2_0,
+    parse_table,
+    select_adapter,
+)
+
+SUMMARY_RESPONSE = {
+    "Elapsed": 1000,
+    "MHS av": 68000000.0,
+    "MHS 5s": 67000000.0,
+    "MHS 1m": 68000000.0,
+    "MHS 5m": 68000000.0,
+    "MHS 15m": 68000000.0,
+    "Accepted": 1000,
+    "Rejected": 2,
+    "Temperature": 70.0,
+    "freq_avg": 600,
+    "Fan Speed In": 4000,
+    "Fan Speed Out": 4100,
+    "Power": 3300,
+    "Power_RT": 3300,
+    "Pool Rejected%": 0.1,
+    "Pool Stale%": 0.0,
+    "Uptime": 10000,
+    "Security Mode": 0,
+    "Target Freq": 600,
+    "Target MHS": 68000000,
+    "Env Temp": 25.0,
+    "Power Mode": "Normal",
+    "Chip Temp Min": 60.0,
+    "Chip Temp Max": 80.0,
+    "Chip Temp Avg": 70.0,
+    "MAC": "C4:11:22:33:44:55",
+}
+
+# Informational keys some 2.0.x releases do not report
+V2_0_OPTIONAL_KEYS = ("Env Temp", "Target Freq", "Power Mode", "Pool Stale%")
+
+
+def v2_0_summary_response():
+    response = {
+        key: value
+        for key, value in SUMMARY_RESPONSE.items()
+        if key not in V2_0_OPTIONAL_KEYS and key != "Security Mode"
+    }
+    response.update({"Btmineroff": "false", "Firmware Version": "'20230101.1.1'"})
+    return response
+
+
+@pytest.mark.parametrize(
+    "api_version, adapter",
+    [
+        ("whatsminer v1.4.0", V1_4),
+        ("whatsminer v1.5.2", V1_4),
+        ("v2.0.0", V2_0),
+        ("whatsminer v2.0.5", V2_0),
+        ("2.1", V2_0),
+        ("whatsminer v1.3.0", None),
+        ("whatsminer v3.0.1", None),
+        ("unknown", None),
+    ],
+)
+def test_select_adapter(api_version, adapter):
+    assert select_adapter(api_version) is adapter
+
+
+def test_parse_table_converts_and_applies_defaults():
+    table = {
+        "value": ("Value", int, REQUIRED),
+        "optional": ("Optional", str, None),
+    }
+    assert parse_table(table, {"Value": "3"}) == {"value": 3, "optional": None}
+
+
+def test_parse_table_requires_keys():
+    with pytest.raises(KeyError):
+        parse_table({"value": ("Value", int, REQUIRED)}, {})
+
+
+def test_summary_tables_cover_all_fields():
+    fields = {field.name for field in dataclasses.fields(Summary)}
+    assert set(SUMMARY_V1_4) == fields
+    assert set(V2_0.summary) == fields
+
+
+def test_parse_summary_v1_4():
+    summary = Summary(**V1_4.parse_summary(SUMMARY_RESPONSE))
+    assert summary.hash_rate_5s == 67000
+    assert summary.target_hash_rate == 68000
+    assert summary.security_mode is True
+    assert summary.environment_temperature == 25.0
+
+
+def test_parse_summary_v1_4_requires_all_keys():
+    response = dict(SUMMARY_RESPONSE)
+    del response["Env Temp"]
+    with pytest.raises(KeyError):
+        V1_4.parse_summary(response)
+
+
+def test_parse_summary_v2_0_without_optional_keys():
+    summary = Summary(**V2_0.parse_summary(v2_0_summary_response()))
+    assert summary.environment_temperature is None
+    assert summary.target_frequency is None
+    assert summary.power_mode is None
+    assert summary.pool_stale_percent is None
+    assert summary.security_mode is False
+
+
+def test_parse_summary_status():
+    status = V2_0.parse_summary_status(v2_0_summary_response())
+    assert MinerStatus(**status) == MinerStatus(
+        miner_online=True, firmware_version="20230101.1.1"
+    )
+    assert V2_0.parse_summary_status(SUMMARY_RESPONSE) is None
+    assert V1_4.parse_summary_status(v2_0_summary_response()) is None
+